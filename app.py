@@ -9,12 +9,9 @@ st.set_page_config(
     page_icon=":bar_chart:"
 )
 
-from modules import personas, questions, results, analytics, utils, dashboard, price_sensitivity, live_polling
+from modules import instrumentation, sections
 from PIL import Image
 from streamlit_option_menu import option_menu
-import json
-import requests
-from pymongo import MongoClient
 import logging
 
 # Configure logging
@@ -33,6 +30,44 @@ def load_brand_assets():
 
 logo_image, primary_color = load_brand_assets()
 
+def show_import_profile():
+    profile = sections.import_profile()
+    if profile:
+        with st.sidebar.expander("Import Profile"):
+            st.dataframe(profile, hide_index=True)
+
+def apply_instrumentation_settings():
+    # Instrumentation is process-wide, so it only changes when a user toggles it, not on every rerun.
+    instrumentation.configure(st.session_state["perf_enabled"], st.session_state["perf_allocations"])
+
+def show_performance_panel():
+    with st.sidebar.expander("Performance"):
+        # Mirror the current process-wide state, which another session may have changed.
+        st.session_state["perf_enabled"] = instrumentation.is_enabled()
+        st.session_state["perf_allocations"] = instrumentation.tracks_allocations()
+        enabled = st.checkbox("Record stage timings", key="perf_enabled", on_change=apply_instrumentation_settings)
+        st.checkbox("Track allocations (slower)", key="perf_allocations", disabled=not enabled, on_change=apply_instrumentation_settings)
+        st.caption("These settings apply to every session on this server. Allocations are net tracemalloc deltas for the whole process, so they include other sessions' work and can be negative.")
+        rows = instrumentation.registry.snapshot()
+        if rows:
+            st.dataframe(
+                [{key: round(value, 2) if isinstance(value, float) else value for key, value in row.items() if key != "buckets"} for row in rows],
+                hide_index=True,
+            )
+        elif enabled:
+            st.caption("No stages recorded yet.")
+        col1, col2 = st.columns(2)
+        if col1.button("Export JSON", key="perf_export"):
+            st.success(f"Wrote {instrumentation.registry.dump_json()}")
+        if col2.button("Reset", key="perf_reset"):
+            instrumentation.registry.reset()
+        port = st.number_input("Metrics port", min_value=1024, max_value=65535, value=instrumentation.METRICS_PORT or 9464, key="perf_port")
+        if st.button("Serve /metrics", key="perf_serve"):
+            try:
+                st.success(f"Prometheus metrics at http://127.0.0.1:{instrumentation.serve_metrics(int(port))}/metrics")
+            except OSError as e:
+                st.error(f"Could not start the metrics endpoint: {str(e)}")
+
 # --- Main App Logic ---
 def main():
     with st.container():
@@ -43,7 +78,7 @@ def main():
         # --- Navigation ---
         selected = option_menu(
             menu_title=None,
-            options=["Demand Meter", "Price Sensitivity", "Live Polling"],
+            options=list(sections.SECTIONS),
             icons=["bar-chart", "graph-up-arrow", "chat-dots"],
             menu_icon="cast",
             default_index=0,
@@ -56,17 +91,15 @@ def main():
         )
 
         # --- App Sections ---
+        # Only the selected section's module is imported, on first use.
         try:
-            if selected == "Demand Meter":
-                dashboard.run_dashboard()  # Call the module to run Demand Meter
-            elif selected == "Price Sensitivity":
-                price_sensitivity.run_price_sensitivity()  # Call the module to run Price Sensitivity
-            elif selected == "Live Polling":
-                live_polling.run_live_polling()  # Call the module to run Live Polling
+            sections.run_section(selected)
         except Exception as e:
             st.error(f"Error running {selected}: {str(e)}")
             logging.error(f"Error running {selected}: {str(e)}")
-            utils.log_error(selected, str(e))
+            sections.timed_import("modules.utils").log_error(selected, str(e))
+        show_import_profile()
+        show_performance_panel()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,119 @@
+"""Render time and memory of the demand charts: legacy seaborn path vs cached artifacts.
+
+Each implementation runs in its own subprocess so RSS readings do not bleed
+into each other. Two workloads are measured:
+
+- rerun: the same result rendered repeatedly, as on every Streamlit rerun
+- distinct: a new result every iteration, which exercises cache eviction
+
+Usage: python benchmarks/visualizations_benchmark.py [--iterations 30] [--features 20] [--taglines 20]
+"""
+import argparse
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from itertools import product
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+
+def make_result(features, taglines, prices, seed):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        list(product([f"Feature {i}" for i in range(features)], [f"Tagline {i}" for i in range(taglines)], np.linspace(5, 50, prices))),
+        columns=["Feature", "Tagline", "Price"],
+    )
+    df["Demand Score"] = rng.uniform(60, 90, len(df))
+    return df
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except OSError:
+        # Peak rather than current RSS; kilobytes on Linux, bytes on macOS.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def legacy_render(df):
+    """The previous implementation, with st.pyplot replaced by the PNG it would send."""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    sns.histplot(df['Demand Score'], bins=20, kde=True, ax=ax)
+    fig.savefig(io.BytesIO(), format="png")
+    heatmap_data = df.pivot_table(values='Demand Score', index='Feature', columns='Tagline', aggfunc='mean')
+    fig, ax = plt.subplots(figsize=(12, 8))
+    sns.heatmap(heatmap_data, annot=True, cmap="YlGnBu", ax=ax)
+    fig.savefig(io.BytesIO(), format="png")
+
+
+def cached_render(df):
+    from modules import visualizations
+    visualizations.cached_render("distribution", df)
+    visualizations.cached_render("heatmap", df)
+
+
+def run(mode, workload, iterations, features, taglines, prices):
+    render = legacy_render if mode == "legacy" else cached_render
+    results = [make_result(features, taglines, prices, seed) for seed in range(iterations if workload == "distinct" else 1)]
+    render(results[0])  # Warm up imports and font caches.
+    start_rss = rss_mb()
+    timings = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        render(results[i % len(results)])
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings) * 1000
+    return {
+        "mode": mode,
+        "workload": workload,
+        "mean_ms": float(timings.mean()),
+        "p95_ms": float(np.percentile(timings, 95)),
+        "rss_growth_mb": rss_mb() - start_rss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--features", type=int, default=20)
+    parser.add_argument("--taglines", type=int, default=20)
+    parser.add_argument("--prices", type=int, default=5)
+    parser.add_argument("--mode", choices=["legacy", "cached"], help=argparse.SUPPRESS)
+    parser.add_argument("--workload", choices=["rerun", "distinct"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run(args.mode, args.workload, args.iterations, args.features, args.taglines, args.prices)))
+        return
+
+    print(f"{args.features} features x {args.taglines} taglines x {args.prices} prices, {args.iterations} iterations")
+    print(f"{'workload':<10}{'mode':<8}{'mean ms':>10}{'p95 ms':>10}{'RSS growth MB':>16}")
+    for workload in ("rerun", "distinct"):
+        for mode in ("legacy", "cached"):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--mode", mode, "--workload", workload,
+                 "--iterations", str(args.iterations), "--features", str(args.features),
+                 "--taglines", str(args.taglines), "--prices", str(args.prices)],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            row = json.loads(output.strip().splitlines()[-1])
+            print(f"{workload:<10}{mode:<8}{row['mean_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['rss_growth_mb']:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
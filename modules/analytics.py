@@ -1,50 +1,240 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
 import random
+from modules import gabor_granger
 
-def van_westendorp_analysis(price_points, responses):
-    """Performs Van Westendorp price sensitivity analysis."""
-    too_expensive = []
-    too_cheap = []
-    just_right = []
-    too_expensive_data = []
-    too_cheap_data = []
-    just_right_data = []
-    for response in responses:
-        for i, price in enumerate(price_points):
-            if response == "Too expensive":
-                too_expensive_data.append(price)
-                too_expensive.append(i)
-            elif response == "Too cheap":
-                too_cheap_data.append(price)
-                too_cheap.append(i)
-            elif response == "Just right":
-                just_right_data.append(price)
-                just_right.append(i)
-
-    # Calculate Optimal Price Range
-    too_expensive_avg = sum(too_expensive_data) / len(too_expensive_data) if too_expensive_data else 0
-    too_cheap_avg = sum(too_cheap_data) / len(too_cheap_data) if too_cheap_data else 0
-    just_right_avg = sum(just_right_data) / len(just_right_data) if just_right_data else 0
-
-    optimal_price_range = (too_cheap_avg, too_expensive_avg)
-    return optimal_price_range, too_expensive, too_cheap, just_right
+logger = logging.getLogger(__name__)
+
+VW_GRID_POINTS = 512
+
+def van_westendorp_grid(*thresholds, points=VW_GRID_POINTS):
+    """Evenly spaced price grid spanning all respondent thresholds."""
+    finite = [t[np.isfinite(t)] for t in thresholds]
+    finite = [t for t in finite if t.size]
+    if not finite:
+        return np.empty(0)
+    low = min(float(t.min()) for t in finite)
+    high = max(float(t.max()) for t in finite)
+    return np.linspace(low, high, points)
+
+def _share_at_or_below(sorted_values, grid):
+    return np.searchsorted(sorted_values, grid, side="right") / max(sorted_values.size, 1)
+
+def _share_at_or_above(sorted_values, grid):
+    return 1 - np.searchsorted(sorted_values, grid, side="left") / max(sorted_values.size, 1)
+
+def van_westendorp_curves(too_cheap, cheap, expensive, too_expensive, price_points=None):
+    """Cumulative Van Westendorp curves evaluated on ``price_points``.
+
+    Each argument holds one threshold price per respondent. "Too cheap" and
+    "cheap" are the shares of respondents whose threshold is at or above the
+    price; "expensive" and "too expensive" the shares at or below it.
+    """
+    arrays = [np.asarray(t, dtype=np.float64) for t in (too_cheap, cheap, expensive, too_expensive)]
+    grid = np.asarray(price_points, dtype=np.float64) if price_points is not None else van_westendorp_grid(*arrays)
+    tc, ch, ex, te = (np.sort(t[np.isfinite(t)]) for t in arrays)
+    return _curve_frame(
+        grid,
+        _share_at_or_above(tc, grid),
+        _share_at_or_above(ch, grid),
+        _share_at_or_below(ex, grid),
+        _share_at_or_below(te, grid),
+    )
+
+def _curve_frame(grid, too_cheap, cheap, expensive, too_expensive):
+    return pd.DataFrame({
+        "Price": grid,
+        "Too Cheap": too_cheap,
+        "Cheap": cheap,
+        "Not Cheap": 1 - cheap,
+        "Expensive": expensive,
+        "Not Expensive": 1 - expensive,
+        "Too Expensive": too_expensive,
+    })
+
+def curve_intersection(price, falling, rising):
+    """Price where a rising curve first meets a falling one, linearly interpolated."""
+    gap = np.asarray(rising) - np.asarray(falling)
+    crossed = np.flatnonzero(gap >= 0)
+    if crossed.size == 0:
+        return float("nan")
+    i = crossed[0]
+    if i == 0 or gap[i] == 0:
+        return float(price[i])
+    x0, x1, g0, g1 = price[i - 1], price[i], gap[i - 1], gap[i]
+    return float(x0 + (x1 - x0) * -g0 / (g1 - g0))
+
+def van_westendorp_points(curves):
+    """The four Van Westendorp price points from a curve frame."""
+    price = curves["Price"].to_numpy()
+    return {
+        "PMC": curve_intersection(price, curves["Too Cheap"].to_numpy(), curves["Not Cheap"].to_numpy()),
+        "OPP": curve_intersection(price, curves["Too Cheap"].to_numpy(), curves["Too Expensive"].to_numpy()),
+        "IPP": curve_intersection(price, curves["Cheap"].to_numpy(), curves["Expensive"].to_numpy()),
+        "PME": curve_intersection(price, curves["Not Expensive"].to_numpy(), curves["Too Expensive"].to_numpy()),
+    }
+
+def van_westendorp_analysis(too_cheap, cheap, expensive, too_expensive, price_points=None):
+    """Performs Van Westendorp price sensitivity analysis on per-respondent thresholds.
+
+    Returns the curve frame, the PMC/OPP/IPP/PME price points, the acceptable
+    price range (PMC to PME) and the optimal price range (OPP to IPP).
+    """
+    return _van_westendorp_result(van_westendorp_curves(too_cheap, cheap, expensive, too_expensive, price_points))
+
+def _van_westendorp_result(curves):
+    points = van_westendorp_points(curves)
+    return {
+        "curves": curves,
+        "points": points,
+        "acceptable_range": (points["PMC"], points["PME"]),
+        "optimal_range": tuple(sorted((points["OPP"], points["IPP"]))),
+    }
+
+class VanWestendorpAccumulator:
+    """Builds Van Westendorp curves over a fixed price grid from batches of thresholds.
+
+    Only per-grid-point histograms are kept, so memory does not grow with the
+    number of respondents; the curves equal ``van_westendorp_curves`` on the same grid.
+    """
+
+    def __init__(self, price_points):
+        self.grid = np.asarray(price_points, dtype=np.float64)
+        size = self.grid.size + 1
+        # "At or above" histograms for the cheap questions, "at or below" for the expensive ones.
+        self.above = {name: np.zeros(size, dtype=np.int64) for name in ("too_cheap", "cheap")}
+        self.below = {name: np.zeros(size, dtype=np.int64) for name in ("expensive", "too_expensive")}
+        self.totals = dict.fromkeys(("too_cheap", "cheap", "expensive", "too_expensive"), 0)
+
+    def update(self, too_cheap, cheap, expensive, too_expensive):
+        for name, values in (("too_cheap", too_cheap), ("cheap", cheap), ("expensive", expensive), ("too_expensive", too_expensive)):
+            values = np.asarray(values, dtype=np.float64)
+            values = values[np.isfinite(values)]
+            self.totals[name] += values.size
+            if name in self.above:
+                self.above[name] += np.bincount(np.searchsorted(self.grid, values, side="right"), minlength=self.grid.size + 1)
+            else:
+                self.below[name] += np.bincount(np.searchsorted(self.grid, values, side="left"), minlength=self.grid.size + 1)
+
+    def _share(self, name):
+        total = max(self.totals[name], 1)
+        if name in self.above:
+            return 1 - np.cumsum(self.above[name])[:-1] / total
+        return np.cumsum(self.below[name])[:-1] / total
+
+    @property
+    def respondents(self):
+        return max(self.totals.values())
+
+    def curves(self):
+        return _curve_frame(self.grid, self._share("too_cheap"), self._share("cheap"), self._share("expensive"), self._share("too_expensive"))
+
+    def result(self):
+        return _van_westendorp_result(self.curves())
 
 def gabor_granger_analysis(price_points, responses):
     """Performs Gabor-Granger price sensitivity analysis."""
-    demand_at_price = {}
-    for i, price in enumerate(price_points):
-        demand_at_price[price] = responses.count(i)
-    return demand_at_price
-
-def analyze_sentiment(responses):
-    """Performs sentiment analysis on survey responses."""
-    sentiments = []
-    for response in responses:
-        if isinstance(response, str):
-            prompt = f"""Analyze the sentiment of the following text:
-            "{response}"
-            Provide the sentiment as "positive", "negative", or "neutral".
-            """
-            sentiment = llm(prompt)
-            sentiments.append({"Response": response, "Sentiment": sentiment})
-    return sentiments
\ No newline at end of file
+    counts = gabor_granger.intent_counts(responses, len(price_points))
+    return dict(zip(price_points, counts.tolist(), strict=True))
+
+SENTIMENTS = ("positive", "negative", "neutral")
+SENTIMENT_BATCH_SIZE = 25
+SENTIMENT_CACHE_SIZE = 50_000
+
+POSITIVE_WORDS = {
+    "good", "great", "excellent", "love", "like", "enjoy", "happy", "amazing", "awesome", "best",
+    "positive", "helpful", "easy", "fantastic", "satisfied", "recommend", "nice", "pleased", "value", "worth",
+}
+NEGATIVE_WORDS = {
+    "bad", "poor", "terrible", "hate", "dislike", "awful", "worst", "negative", "difficult", "hard",
+    "expensive", "disappointed", "unhappy", "problem", "broken", "slow", "annoying", "useless", "waste", "confusing",
+}
+NEGATIONS = {"not", "no", "never", "dont", "don't", "isn't", "isnt", "wasn't", "cannot", "can't"}
+
+_sentiment_cache = OrderedDict()
+_sentiment_lock = threading.Lock()
+
+def lexicon_sentiment(text):
+    """Fast local sentiment: counts lexicon hits, flipping a word that follows a negation."""
+    score = 0
+    negate = False
+    for word in re.findall(r"[a-z']+", text.lower()):
+        if word in NEGATIONS:
+            negate = True
+            continue
+        polarity = (word in POSITIVE_WORDS) - (word in NEGATIVE_WORDS)
+        score += -polarity if negate else polarity
+        negate = False
+    if score > 0:
+        return "positive"
+    if score < 0:
+        return "negative"
+    return "neutral"
+
+def _sentiment_key(classifier, text):
+    return classifier, hashlib.sha256(text.encode()).hexdigest()
+
+def _batch_prompt(texts):
+    numbered = json.dumps([{"id": i, "text": text} for i, text in enumerate(texts)], ensure_ascii=False)
+    return (
+        "Classify the sentiment of each text below as \"positive\", \"negative\" or \"neutral\".\n"
+        f"Reply with only a JSON array of exactly {len(texts)} strings, in the same order as the ids.\n"
+        f"{numbered}"
+    )
+
+def _parse_batch(output, expected):
+    start, end = output.find("["), output.rfind("]")
+    labels = json.loads(output[start:end + 1]) if start != -1 and end > start else None
+    if not isinstance(labels, list) or len(labels) != expected:
+        raise ValueError(f"Expected a JSON array of {expected} labels")
+    labels = [str(label).strip().lower() for label in labels]
+    if any(label not in SENTIMENTS for label in labels):
+        raise ValueError(f"Unexpected sentiment labels: {labels}")
+    return labels
+
+def analyze_sentiment(responses, llm=None, batch_size=SENTIMENT_BATCH_SIZE):
+    """Performs sentiment analysis on survey responses.
+
+    Identical responses are classified once and results are cached by text
+    hash. With an ``llm`` callable, pending texts are packed ``batch_size`` to a
+    prompt; without one, or when a batch reply cannot be parsed, the local
+    lexicon scorer is used.
+    """
+    texts = [response for response in responses if isinstance(response, str)]
+    classifier = "llm" if llm is not None else "lexicon"
+    labels = {}
+    with _sentiment_lock:
+        for text in dict.fromkeys(texts):
+            key = _sentiment_key(classifier, text)
+            if key in _sentiment_cache:
+                _sentiment_cache.move_to_end(key)
+                labels[text] = _sentiment_cache[key]
+    pending = [text for text in dict.fromkeys(texts) if text not in labels]
+
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        batch_labels = None
+        batch_classifier = classifier
+        if llm is not None:
+            try:
+                batch_labels = _parse_batch(llm(_batch_prompt(batch)), len(batch))
+            except Exception as e:
+                logger.warning(f"Falling back to lexicon sentiment for {len(batch)} responses: {str(e)}")
+        if batch_labels is None:
+            # Fallback labels are cached as lexicon results so the LLM is asked again next time.
+            batch_classifier = "lexicon"
+            batch_labels = [lexicon_sentiment(text) for text in batch]
+        labels.update(zip(batch, batch_labels, strict=True))
+        with _sentiment_lock:
+            for text, label in zip(batch, batch_labels, strict=True):
+                _sentiment_cache[_sentiment_key(batch_classifier, text)] = label
+            while len(_sentiment_cache) > SENTIMENT_CACHE_SIZE:
+                _sentiment_cache.popitem(last=False)
+
+    return [{"Response": text, "Sentiment": labels[text]} for text in texts]
@@ -0,0 +1,115 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from modules import instrumentation
+
+logger = logging.getLogger(__name__)
+
+# Bounds for LLM-backed persona voting: personas per prompt and prompts in flight.
+BATCH_SIZE = 25
+MAX_CONCURRENT_THREADS = 25
+FOLLOWUP_ANSWERS = np.array(["Yes", "No", "Not sure"])
+
+
+def active_options(options):
+    """Letters and texts of the options that were filled in, e.g. {"A": "Red"}."""
+    return {key.split("_")[-1]: text for key, text in options.items() if text}
+
+
+def option_probabilities(population, num_options):
+    """(bots x options) choice probabilities conditioned on income, gender and interests.
+
+    Higher incomes lean towards later options, the genders lean in opposite
+    directions on alternate options, and bots with more interests are more
+    decisive (sharper preferences).
+    """
+    income = population.income.astype(np.float64)
+    income_z = (income - income.mean()) / (income.std() or 1.0)
+    position = np.linspace(-1.0, 1.0, num_options) if num_options > 1 else np.zeros(1)
+    alternate = np.where(np.arange(num_options) % 2 == 0, 1.0, -1.0)
+    gender = np.where(population.is_male, 1.0, -1.0)
+    decisiveness = 1.0 + 0.15 * np.bitwise_count(population.interest_mask).astype(np.float64)
+    logits = 0.6 * income_z[:, None] * position[None, :] + 0.3 * gender[:, None] * alternate[None, :]
+    logits *= decisiveness[:, None]
+    logits -= logits.max(axis=1, keepdims=True)
+    weights = np.exp(logits)
+    return weights / weights.sum(axis=1, keepdims=True)
+
+
+def _draw(rng, probabilities):
+    cdf = np.cumsum(probabilities, axis=1)
+    u = rng.random(len(probabilities))[:, None]
+    return np.minimum((u > cdf).sum(axis=1), probabilities.shape[1] - 1)
+
+
+@instrumentation.timed("simulate_votes")
+def simulate_votes(population, options, seed=None, choices=None):
+    """Assigns every bot an option and follow-up answers in vectorized draws.
+
+    Returns the population with ``response`` (option letter), ``followup_1``
+    (a 0-10 score) and ``followup_2`` (Yes / No / Not sure) columns. ``choices``
+    overrides the drawn option indices, e.g. with LLM votes.
+    """
+    letters = list(active_options(options))
+    if not letters:
+        raise ValueError("At least one option is required.")
+    rng = np.random.default_rng(seed)
+    probabilities = option_probabilities(population, len(letters))
+    drawn = _draw(rng, probabilities)
+    if choices is not None:
+        choices = np.asarray(choices)
+        drawn = np.where(choices >= 0, choices, drawn)
+
+    # Bots that picked an option they strongly preferred rate it higher.
+    affinity = probabilities[np.arange(len(drawn)), drawn] * len(letters)
+    score = np.clip(rng.normal(4.5 + 1.5 * affinity, 1.5), 0, 10).round(1).astype(np.float32)
+    answer_probs = np.column_stack([0.3 + 0.1 * affinity, np.full(len(drawn), 0.3), np.full(len(drawn), 0.3)])
+    answer_probs /= answer_probs.sum(axis=1, keepdims=True)
+    answers = FOLLOWUP_ANSWERS[_draw(rng, answer_probs)]
+
+    return population.assign(
+        response=np.array(letters)[drawn],
+        followup_1=score,
+        followup_2=answers,
+    )
+
+
+def _vote_prompt(question, options, personas):
+    listed = "\n".join(f"{letter}. {text}" for letter, text in options.items())
+    people = json.dumps([{"id": i, "persona": persona} for i, persona in enumerate(personas)], ensure_ascii=False)
+    return (
+        f"Each persona below answers the survey question: {question}\n{listed}\n"
+        f"Reply with only a JSON array of exactly {len(personas)} option letters, in id order.\n{people}"
+    )
+
+
+def _parse_votes(output, letters, expected):
+    start, end = output.find("["), output.rfind("]")
+    votes = json.loads(output[start:end + 1]) if start != -1 and end > start else None
+    if not isinstance(votes, list) or len(votes) != expected:
+        raise ValueError(f"Expected a JSON array of {expected} letters")
+    return [letters.index(v.strip().upper()) if isinstance(v, str) and v.strip().upper() in letters else -1 for v in votes]
+
+
+def llm_choices(personas, question, options, llm, batch_size=BATCH_SIZE, max_workers=MAX_CONCURRENT_THREADS):
+    """Option index chosen by each persona via the LLM, or -1 where no valid vote came back.
+
+    Personas are packed ``batch_size`` to a prompt and at most ``max_workers``
+    prompts run concurrently.
+    """
+    options = active_options(options)
+    letters = list(options)
+    personas = list(personas)
+    batches = [personas[start:start + batch_size] for start in range(0, len(personas), batch_size)]
+
+    def vote_batch(batch):
+        try:
+            return _parse_votes(llm(_vote_prompt(question, options, batch)), letters, len(batch))
+        except Exception as e:
+            logger.warning(f"LLM voting failed for {len(batch)} personas; using simulated votes: {str(e)}")
+            return [-1] * len(batch)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = list(pool.map(vote_batch, batches))
+    return np.array([choice for batch in results for choice in batch], dtype=np.int64)
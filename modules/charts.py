@@ -0,0 +1,146 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+from modules import instrumentation
+
+# Above this many points a scatter is aggregated / downsampled on the server.
+MAX_SCATTER_POINTS = 2000
+# WebGL takes over from SVG markers past this many points.
+SCATTERGL_THRESHOLD = 1000
+# Features and taglines shown on the heatmap, ranked by mean demand.
+HEATMAP_TOP_K = 25
+MAX_CACHED_FIGURES = 64
+
+
+def result_hash(df):
+    """Content hash of a result frame, used to key built figures."""
+    digest = hashlib.sha256("\x1f".join(map(str, df.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def lttb(x, y, threshold):
+    """Indices of the points kept by Largest-Triangle-Three-Buckets downsampling.
+
+    ``x`` must be sorted. The first and last points are always kept and each
+    bucket in between keeps the point spanning the largest triangle with its
+    neighbours, which preserves peaks and troughs of the series.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x, avg_y = x[stop:next_stop].mean(), y[stop:next_stop].mean()
+        area = np.abs((x[previous] - avg_x) * (y[start:stop] - y[previous]) - (x[previous] - x[start:stop]) * (avg_y - y[previous]))
+        previous = keep[bucket + 1] = start + int(area.argmax())
+    return keep
+
+
+def downsample_scatter(df, max_points=MAX_SCATTER_POINTS):
+    """Reduces a Feature/Tagline/Price/Demand Score frame to at most ~``max_points`` rows.
+
+    Cells are first averaged across taglines per (feature, price); if that is
+    still too many, each feature's price series is thinned with LTTB.
+    """
+    if len(df) <= max_points:
+        return df
+    binned = (
+        df.groupby(["Feature", "Price"], sort=True, observed=True)["Demand Score"]
+        .agg(["mean", "size"])
+        .reset_index()
+        .rename(columns={"mean": "Demand Score", "size": "Taglines"})
+    )
+    if len(binned) <= max_points:
+        return binned
+    per_feature = max(3, max_points // binned["Feature"].nunique())
+    parts = [
+        group.iloc[lttb(group["Price"], group["Demand Score"], per_feature)]
+        for _, group in binned.groupby("Feature", sort=False, observed=True)
+    ]
+    return pd.concat(parts, ignore_index=True)
+
+
+@instrumentation.timed("chart_scatter")
+def scatter_figure(df, max_points=MAX_SCATTER_POINTS):
+    """Price vs demand scatter, one trace per feature, as a Plotly figure dict."""
+    data = downsample_scatter(df, max_points)
+    trace = go.Scattergl if len(data) > SCATTERGL_THRESHOLD else go.Scatter
+    fig = go.Figure()
+    for feature, group in data.groupby("Feature", sort=False, observed=True):
+        if "Tagline" in group:
+            text, detail = group["Tagline"], "Tagline: %{text}"
+        else:
+            text, detail = group["Taglines"], "Mean of %{text} taglines"
+        fig.add_trace(trace(
+            x=group["Price"].to_numpy(),
+            y=group["Demand Score"].to_numpy(),
+            text=text.to_numpy(),
+            mode="markers",
+            name=str(feature),
+            hovertemplate=f"Price: %{{x}}<br>Demand Score: %{{y:.2f}}<br>{detail}<extra>{feature}</extra>",
+        ))
+    title = "" if data is df else f"Aggregated to {len(data):,} of {len(df):,} points"
+    fig.update_layout(title=title, xaxis_title="Price", yaxis_title="Demand Score", legend_title_text="Feature")
+    return fig.to_dict()
+
+
+@instrumentation.timed("pivot")
+def top_k_pivot(df, top_k=HEATMAP_TOP_K):
+    """Feature x Tagline mean demand, limited to the ``top_k`` highest features and taglines."""
+    features = df.groupby("Feature", observed=True)["Demand Score"].mean().nlargest(top_k).index
+    taglines = df.groupby("Tagline", observed=True)["Demand Score"].mean().nlargest(top_k).index
+    subset = df[df["Feature"].isin(features) & df["Tagline"].isin(taglines)]
+    return subset.pivot_table(index="Feature", columns="Tagline", values="Demand Score", observed=True)
+
+
+@instrumentation.timed("chart_heatmap")
+def heatmap_figure(df, top_k=HEATMAP_TOP_K):
+    heatmap_data = top_k_pivot(df, top_k)
+    fig = go.Figure(data=go.Heatmap(z=heatmap_data.to_numpy(), x=list(heatmap_data.columns), y=list(heatmap_data.index)))
+    if df["Feature"].nunique() > top_k or df["Tagline"].nunique() > top_k:
+        fig.update_layout(title=f"Top {top_k} features and taglines by mean demand")
+    return fig.to_dict()
+
+
+class FigureCache:
+    """LRU of built chart artifacts (figure dicts, rendered images), keyed by kind, result hash and options."""
+
+    def __init__(self, max_entries=MAX_CACHED_FIGURES):
+        self.max_entries = max_entries
+        self._figures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            if key in self._figures:
+                self._figures.move_to_end(key)
+                return self._figures[key]
+        figure = build()
+        with self._lock:
+            self._figures[key] = figure
+            self._figures.move_to_end(key)
+            while len(self._figures) > self.max_entries:
+                self._figures.popitem(last=False)
+        return figure
+
+
+_figure_cache = FigureCache()
+
+
+def demand_figures(df, max_points=MAX_SCATTER_POINTS, top_k=HEATMAP_TOP_K):
+    """Scatter and heatmap figure dicts for a demand grid, built once per distinct result."""
+    key = result_hash(df)
+    scatter = _figure_cache.get_or_build(("scatter", key, max_points), lambda: scatter_figure(df, max_points))
+    heatmap = _figure_cache.get_or_build(("heatmap", key, top_k), lambda: heatmap_figure(df, top_k))
+    return scatter, heatmap
@@ -1,110 +1,289 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objs as go
 from itertools import product
-from modules import utils, narrative  # Ensure you have the utils and narrative modules defined
+from modules import utils, narrative, charts, jobs, segments, simulation, result_cache, session as session_state, summary as summary_engine  # Ensure you have the utils and narrative modules defined
 import logging
-from openai import OpenAI
 import os
+from concurrent.futures import Future, TimeoutError as FuturesTimeoutError
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
 # Custom CSS for better visuals and modern look
-st.markdown("""
-    <style>
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            background-color: #1E1E1E;
-            color: #D4D4D4;
-        }
-        .report-title {
-            font-size: 2.5rem;
-            color: #FFC300;
-            margin-top: 20px;
-            margin-bottom: 20px;
-        }
-        .section-header {
-            font-size: 1.8rem;
-            color: #FFD700;
-            margin-top: 20px;
-            margin-bottom: 10px;
-        }
-        .key-insights {
-            font-size: 1.2rem;
-            color: #E0E0E0;
-            background-color: #333333;
-            padding: 20px;
-            border-radius: 10px;
-            margin-top: 20px;
-        }
-        .metric {
-            font-size: 1.5rem;
-            font-weight: bold;
-            color: #FFD700;
-            margin: 10px 0;
-        }
-        .sidebar .sidebar-content {
-            background-color: #333333;
-            padding: 20px;
-            border-radius: 10px;
-        }
-        .sidebar .sidebar-content input, .sidebar .sidebar-content select {
-            background-color: #444444;
-            color: #D4D4D4;
-            border: none;
-            border-radius: 5px;
-            padding: 10px;
-        }
-        .sidebar .sidebar-content button {
-            background-color: #FFC300;
-            color: #1E1E1E;
-            border: none;
-            border-radius: 5px;
-            padding: 10px 20px;
-            margin-top: 10px;
-        }
-    </style>
-""", unsafe_allow_html=True)
-
-# Initialize OpenAI client
-openai_client = OpenAI()
-openai_client.api_key = os.getenv('OPENAI_API_KEY')
-if not openai_client.api_key:
-    st.error("OpenAI API key is missing. Please set the OPENAI_API_KEY environment variable.")
+def inject_css():
+    st.markdown("""
+        <style>
+            body {
+                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+                background-color: #1E1E1E;
+                color: #D4D4D4;
+            }
+            .report-title {
+                font-size: 2.5rem;
+                color: #FFC300;
+                margin-top: 20px;
+                margin-bottom: 20px;
+            }
+            .section-header {
+                font-size: 1.8rem;
+                color: #FFD700;
+                margin-top: 20px;
+                margin-bottom: 10px;
+            }
+            .key-insights {
+                font-size: 1.2rem;
+                color: #E0E0E0;
+                background-color: #333333;
+                padding: 20px;
+                border-radius: 10px;
+                margin-top: 20px;
+            }
+            .metric {
+                font-size: 1.5rem;
+                font-weight: bold;
+                color: #FFD700;
+                margin: 10px 0;
+            }
+            .sidebar .sidebar-content {
+                background-color: #333333;
+                padding: 20px;
+                border-radius: 10px;
+            }
+            .sidebar .sidebar-content input, .sidebar .sidebar-content select {
+                background-color: #444444;
+                color: #D4D4D4;
+                border: none;
+                border-radius: 5px;
+                padding: 10px;
+            }
+            .sidebar .sidebar-content button {
+                background-color: #FFC300;
+                color: #1E1E1E;
+                border: none;
+                border-radius: 5px;
+                padding: 10px 20px;
+                margin-top: 10px;
+            }
+        </style>
+    """, unsafe_allow_html=True)
 
-# Function to generate narrative summary using OpenAI GPT
-def generate_narrative_summary(df):
-    prompt = f"Generate an executive summary for the following data:\n{df.to_string(index=False)}"
+# OpenAI client, created on first use rather than at import
+@st.cache_resource
+def get_openai_client():
+    from openai import OpenAI
+    return OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+
+@st.cache_resource
+def get_result_cache():
+    return result_cache.ResultCache()
+
+@st.cache_resource
+def get_job_runner():
+    return jobs.JobRunner()
+
+@st.cache_resource
+def get_segment_cache():
+    return segments.SegmentCache()
+
+def population_key(num_bots, male_percentage, income_range, interests_list, seed):
+    """Hash of the inputs that determine the bot population and its per-cell scores."""
+    return result_cache.inputs_key(
+        engine=simulation.ENGINE_VERSION,
+        num_bots=int(num_bots),
+        male_percentage=male_percentage,
+        income_range=list(income_range),
+        interests=interests_list,
+        seed=int(seed),
+    )
+
+def simulation_key(features, taglines, price_options, num_bots, male_percentage, income_range, interests_list, seed):
+    return result_cache.inputs_key(
+        population=population_key(num_bots, male_percentage, income_range, interests_list, seed),
+        features=features,
+        taglines=taglines,
+        prices=price_options,
+    )
+
+def run_incremental_simulation(session, combinations, num_bots, male_percentage, income_range, interests_list, seed, executor, progress):
+    """Simulates only the cells missing from the session's last grid for the same population."""
+    base_key = population_key(num_bots, male_percentage, income_range, interests_list, seed)
+    reuse = session.has_result and session.population_key == base_key and session.segments is not None
+    previous, previous_segments = (session.df, session.segments) if reuse else (None, None)
+    pending = simulation.missing_cells(previous, combinations)
+    fresh, fresh_segments = None, None
+    if pending:
+        if previous is not None:
+            progress.info(f"Simulating {len(pending)} new of {len(combinations)} combinations.")
+        fresh, fresh_segments = utils.process_simulation(pending, num_bots, male_percentage, income_range, interests_list, progress, seed=int(seed), executor=executor, with_segments=True)
+    df = simulation.merge_grid(previous, fresh, combinations)
+    segmented = segments.merge_segmented(previous_segments, fresh_segments, df) if not df.empty else None
+    return df, segmented
+
+def load_job_result(job):
+    """Makes a finished background job the session's current result."""
+    result = get_job_runner().result(job["id"])
+    if result is None:
+        st.error("The results of this job are no longer available.")
+        return
+    df, segmented = result
+    details = job["details"]
+    get_result_cache().put(details["inputs_key"], df)
+    get_segment_cache().put(details["inputs_key"], segmented)
+    session_state.get_demand_session().store_result(details["inputs_key"], details["population_key"], df, segmented, **details["display"])
+    st.rerun()
 
+def show_jobs_panel():
+    """Background sweeps; the panel only polls for progress while a job is queued or running."""
+    runner = get_job_runner()
+    if runner.has_active():
+        show_live_jobs_panel()
+    else:
+        render_jobs_panel(runner)
+
+@utils.auto_refresh(1.0)
+def show_live_jobs_panel():
+    """Reruns on its own while the page stays put, until the last active job ends."""
+    runner = get_job_runner()
+    if not runner.has_active():
+        st.rerun()  # Back to the static panel, which also offers the finished job's Load button.
+    render_jobs_panel(runner)
+
+def render_jobs_panel(runner):
+    recent = [job for job in runner.jobs(limit=5) if job["details"].get("inputs_key")]
+    if not recent:
+        return
+    with st.expander("Background Jobs", expanded=any(job["status"] in jobs.ACTIVE_STATUSES for job in recent)):
+        for job in recent:
+            name = job["details"]["display"].get("product_name") or job["id"]
+            col1, col2 = st.columns([4, 1])
+            col1.progress(job["progress"], text=f"{name}: {job['status']} ({job['done_chunks']}/{job['total_chunks']} chunks, {job['combinations']} combinations)")
+            if job["status"] in jobs.ACTIVE_STATUSES and col2.button("Cancel", key=f"job_cancel_{job['id']}"):
+                runner.cancel(job["id"])
+            elif job["status"] in jobs.RESUMABLE_STATUSES and col2.button("Resume", key=f"job_resume_{job['id']}"):
+                runner.resume(job["id"])
+            elif job["status"] == "done" and col2.button("Load", key=f"job_load_{job['id']}"):
+                load_job_result(job)
+            if job["error"]:
+                col1.caption(f"Error: {job['error']}")
+
+def show_segment_breakdown(segmented):
+    """Demand for a slice of the population, scored from the cached per-segment sums."""
+    st.markdown("<h2 class='section-header'>Demand by Segment</h2>", unsafe_allow_html=True)
+    col1, col2, col3 = st.columns(3)
+    deciles = col1.multiselect("Income deciles", list(range(1, segmented.index.num_deciles + 1)), key="segment_deciles")
+    genders = col2.multiselect("Gender", list(segments.GENDERS), format_func=str.title, key="segment_genders")
+    interests = col3.multiselect("Interests", segmented.index.interest_names, key="segment_interests")
+
+    sliced = segmented.demand(deciles, genders, interests)
+    bots = int(sliced["Bots"].iat[0]) if not sliced.empty else 0
+    if not bots:
+        st.info("No bots fall in the selected segments.")
+        return
+    st.write(f"**{bots} bots in the selected segments.** Top combinations:")
+    st.dataframe(sliced.drop(columns="Bots").nlargest(10, "Demand Score").round(2), hide_index=True)
+
+    dimension = st.radio("Break down by", ["decile", "gender", "interest"], format_func=str.title, horizontal=True, key="segment_dimension")
+    breakdown = segmented.by_dimension(dimension)
+    st.bar_chart(breakdown.set_index("Segment")["Demand Score"])
+
+def show_cache_stats(cache):
+    stats = cache.stats()
+    with st.sidebar.expander("Result Cache"):
+        st.write(f"Hits: {stats['memory_hits']} memory, {stats['disk_hits']} disk")
+        st.write(f"Misses: {stats['misses']} (hit rate {stats['hit_rate']:.0%})")
+        st.write(f"Entries: {stats['memory_entries']} in memory, {stats['disk_bytes'] / 1e6:.1f} MB on disk")
+
+@st.cache_resource
+def get_summarizer():
+    return summary_engine.Summarizer(get_openai_client())
+
+def submit_summary(df):
+    """Requests the executive summary; failing to create the client fails the future, not the page."""
     try:
-        response = openai_client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=200
-        )
-
-        # Check if the response has a 'choices' field and if it's not empty
-        if response.choices:
-            summary = response.choices[0].message.content.strip()
-            return summary
-        else:
-            st.warning("OpenAI response did not contain a summary. Please try again later.")
-            return ""  # Return an empty string if there's no summary
+        return get_summarizer().submit(df)
+    except Exception as e:
+        future = Future()
+        future.set_exception(e)
+        return future
 
+def await_summary(future, timeout=summary_engine.SUMMARY_TIMEOUT):
+    """``(summary, error message)`` of a summary future; exactly one of them is set."""
+    try:
+        summary = future.result(timeout=timeout)
+    except FuturesTimeoutError:
+        return None, "The executive summary is taking longer than usual. Retry to check on it."
     except Exception as e:
         logging.error(f"Error generating narrative summary: {str(e)}")
-        st.error(f"Error generating narrative summary. Please try again later.")
-        return "" 
+        return None, "Error generating narrative summary. Please try again later."
+    if not summary:
+        return None, "OpenAI response did not contain a summary. Please try again later."
+    return summary, None
+
+def resolve_summary(future, timeout=summary_engine.SUMMARY_TIMEOUT):
+    """Waits for a summary future and turns failures into UI messages."""
+    summary, error = await_summary(future, timeout)
+    if error:
+        st.warning(error)
+    return summary or ""
+
+def show_results(session, stale=False):
+    """Renders the session's result, building the summary and figures only once per result."""
+    details = session.details
+    if stale:
+        st.info("The inputs have changed since these results were calculated. Press \"Calculate Demand\" to update them.")
+    st.write(f"**Product Name:** {details['product_name']}")
+    st.write(f"**Features:** {details['features']}")
+    st.write(f"**Taglines:** {details['taglines']}")
+    st.write(f"**Prices:** {details['prices']}")
+    st.write(f"**Number of Bots:** {details['num_bots']}")
+    st.write(f"**Combinations:** {details['combinations']}")
+
+    # The summary is requested first but filled in after the charts have rendered.
+    st.markdown("<h2 class='section-header'>Executive Summary</h2>", unsafe_allow_html=True)
+    summary_placeholder = st.empty()
+    if session.summary_error and os.getenv('OPENAI_API_KEY') and st.button("Retry summary", key="summary_retry"):
+        session.summary_error = None
+    summary_future = None
+    if session.summary is None and session.summary_error is None:
+        if os.getenv('OPENAI_API_KEY'):
+            summary_placeholder.info("Generating executive summary...")
+            summary_future = submit_summary(session.df)
+        else:
+            session.summary_error = "Set OPENAI_API_KEY to generate an executive summary."
+
+    st.markdown("<h2 class='section-header'>Detailed Analysis</h2>", unsafe_allow_html=True)
+    if not session.figures:
+        session.figures["scatter"], session.figures["heatmap"] = charts.demand_figures(session.df)
+    st.plotly_chart(session.figures["scatter"], use_container_width=True)
+    st.plotly_chart(session.figures["heatmap"], use_container_width=True)
+
+    if summary_future is not None:
+        # A failed or late summary is remembered, so other interactions do not wait on it again.
+        session.summary, session.summary_error = await_summary(summary_future)
+    if session.summary_error:
+        summary_placeholder.warning(session.summary_error)
+    else:
+        summary_placeholder.markdown(f"<div class='key-insights'>{session.summary or ''}</div>", unsafe_allow_html=True)
+
+    if session.segments is not None:
+        show_segment_breakdown(session.segments)
+
+    # User Feedback
+    st.markdown("<h2 class='section-header'>User Feedback</h2>", unsafe_allow_html=True)
+    feedback = st.text_area("Enter your feedback here:")
+    if st.button("Submit Feedback"):
+        utils.log_feedback(details['product_name'], feedback)
+        st.success("Thank you for your feedback!")
+
+# Function to generate narrative summary using OpenAI GPT
+def generate_narrative_summary(df):
+    return resolve_summary(submit_summary(df))
 
 # Function to generate predictive analytics 
 def generate_predictive_analytics(df):
-    df['Predicted_Demand_Score'] = df['Demand Score'] * 1.05  # Mock prediction logic
-    return df[['Feature', 'Tagline', 'Price', 'Predicted_Demand_Score']]
+    predictions = df[['Feature', 'Tagline', 'Price']].copy()
+    predictions['Predicted_Demand_Score'] = df['Demand Score'] * 1.05  # Mock prediction logic
+    return predictions
 
 # Function to personalize dashboard based on user preferences
 def personalized_insights(user_preferences):
@@ -120,6 +299,9 @@ def setup_alerts():
 
 # Run the main dashboard application
 def run_dashboard():
+    inject_css()
+    if not os.getenv('OPENAI_API_KEY'):
+        st.error("OpenAI API key is missing. Please set the OPENAI_API_KEY environment variable.")
     try:
         st.markdown("<h1 class='report-title'>Executive Dashboard - AI-Powered Demand Insights</h1>", unsafe_allow_html=True)
 
@@ -143,60 +325,85 @@ def run_dashboard():
         income_range = st.sidebar.slider("Income Range (in thousands)", 0, 500, (50, 150))
         interests = st.sidebar.text_input("Enter Interests (comma-separated):", placeholder="Golf, Yoga, Basketball")
         interests_list = [i.strip() for i in interests.split(",")] if interests else []
+        seed = st.sidebar.number_input("Random Seed", min_value=0, value=42, step=1)
+        executor = st.sidebar.selectbox("Execution Mode", simulation.EXECUTORS, help="Run large sweeps on a thread or process pool.")
+        background = st.sidebar.checkbox("Run in background", help="Queue the sweep as a job you can cancel, resume and load later, from any session.")
 
         if interests_list:
             st.sidebar.markdown("<h3 class='section-header'>Interests:</h3>", unsafe_allow_html=True)
             st.sidebar.markdown(" ".join([f'<span style="background-color: #FFD700; color: #1E1E1E; padding: 5px 10px; border-radius: 5px; margin: 5px;">{interest}</span>' for interest in interests_list]), unsafe_allow_html=True)
 
-        # Initialize df outside the conditional block
-        df = pd.DataFrame() 
+        # Results live in session state, so reruns from other widgets do not discard them.
+        session = session_state.get_demand_session()
+        features = [x.strip() for x in product_features.split(',')] if product_features else []
+        taglines = [x.strip() for x in tagline_options.split(',')] if tagline_options else []
+        inputs_key = simulation_key(features, taglines, price_options, num_bots, male_percentage, income_range, interests_list, seed)
 
         if st.sidebar.button("Calculate Demand") and not price_error:
             if not all([product_name, product_features, tagline_options, price_options]):
                 st.warning("Please fill in all product details.")
+            elif session.is_current(inputs_key):
+                # The product name is display-only and not part of inputs_key.
+                session.details["product_name"] = product_name
+                st.info("Results for these inputs are already loaded.")
             else:
-                features = [x.strip() for x in product_features.split(',')]
-                taglines = [x.strip() for x in tagline_options.split(',')]
-                st.write(f"**Product Name:** {product_name}")
-                st.write(f"**Features:** {features}")
-                st.write(f"**Taglines:** {taglines}")
-                st.write(f"**Prices:** {price_options}")
-                st.write(f"**Number of Bots:** {num_bots}")
                 combinations = list(product(features, taglines, price_options))
-                st.write(f"**Combinations:** {combinations}")
-
+                display = {
+                    "product_name": product_name,
+                    "features": features,
+                    "taglines": taglines,
+                    "prices": price_options,
+                    "num_bots": int(num_bots),
+                    "combinations": combinations,
+                }
                 progress_placeholder = st.empty()
+                cache = get_result_cache()
+                segment_cache = get_segment_cache()
                 try:
-                    df = utils.process_simulation(combinations, num_bots, male_percentage, income_range, interests_list, progress_placeholder)
+                    # A result only counts as a hit when its segment sums are cached too;
+                    # otherwise the sweep reruns and the cached frame would go unused.
+                    df = segmented = None
+                    if cache.contains(inputs_key) and segment_cache.contains(inputs_key):
+                        df = cache.get(inputs_key)
+                        segmented = segment_cache.get(inputs_key) if df is not None else None
+                    else:
+                        cache.record_miss()
+                    if segmented is None and background:
+                        job_id = get_job_runner().submit(
+                            combinations, num_bots, male_percentage, income_range, interests_list, int(seed),
+                            job_id=inputs_key[:16],
+                            details={
+                                "inputs_key": inputs_key,
+                                "population_key": population_key(num_bots, male_percentage, income_range, interests_list, seed),
+                                "display": display,
+                            },
+                        )
+                        progress_placeholder.info(f"Queued background job {job_id}. Load its results from Background Jobs when it finishes.")
+                        df = None
+                    elif segmented is None:
+                        df, segmented = run_incremental_simulation(session, combinations, num_bots, male_percentage, income_range, interests_list, seed, executor, progress_placeholder)
+                        if not df.empty:
+                            cache.put(inputs_key, df)
+                            segment_cache.put(inputs_key, segmented)
+                    else:
+                        progress_placeholder.success("Loaded cached results for these inputs.")
+                    if df is not None:
+                        session.store_result(inputs_key, population_key(num_bots, male_percentage, income_range, interests_list, seed), df, segmented, **display)
                 except Exception as e:
+                    session.clear()
                     st.error(f"Error during simulation: {str(e)}")
                     logging.error(f"Error during simulation: {str(e)}")
                     utils.log_error("Demand Meter", str(e))
 
-                if not df.empty:
-                    required_columns = ['Feature', 'Tagline', 'Price', 'Demand Score']
-                    if not all(col in df.columns for col in required_columns):
-                        st.error(f"Required columns are missing. Expected: {required_columns}. Found: {df.columns.tolist()}")
-                        return
-
-                    st.markdown("<h2 class='section-header'>Executive Summary</h2>", unsafe_allow_html=True)
-                    summary = generate_narrative_summary(df)
-                    st.markdown(f"<div class='key-insights'>{summary}</div>", unsafe_allow_html=True)
-
-                    st.markdown("<h2 class='section-header'>Detailed Analysis</h2>", unsafe_allow_html=True)
-                    fig = px.scatter(df, x='Price', y='Demand Score', color='Feature', hover_data=['Tagline'])
-                    st.plotly_chart(fig, use_container_width=True)
-
-                    heatmap_data = df.pivot_table(index="Feature", columns="Tagline", values="Demand Score")
-                    fig = go.Figure(data=go.Heatmap(z=heatmap_data.values, x=heatmap_data.columns, y=heatmap_data.index))
-                    st.plotly_chart(fig, use_container_width=True)
+        show_jobs_panel()
 
-                    # User Feedback
-                    st.markdown("<h2 class='section-header'>User Feedback</h2>", unsafe_allow_html=True)
-                    feedback = st.text_area("Enter your feedback here:")
-                    if st.button("Submit Feedback"):
-                        utils.log_feedback(product_name, feedback)
-                        st.success("Thank you for your feedback!")
+        df = session.df if session.has_result else pd.DataFrame()
+        if session.has_result:
+            required_columns = ['Feature', 'Tagline', 'Price', 'Demand Score']
+            if not all(col in df.columns for col in required_columns):
+                st.error(f"Required columns are missing. Expected: {required_columns}. Found: {df.columns.tolist()}")
+                return
+            show_results(session, stale=session.inputs_key != inputs_key)
 
         # Predictive Analytics (Now uses df even if not calculated)
         st.markdown("<h2 class='section-header'>Predictive Analytics</h2>", unsafe_allow_html=True)
@@ -217,6 +424,7 @@ def run_dashboard():
 
         # Set up Alerts
         setup_alerts()
+        show_cache_stats(get_result_cache())
 
     except Exception as e:
         logging.error(f"Error in run_dashboard: {str(e)}")
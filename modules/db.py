@@ -0,0 +1,197 @@
+import atexit
+import logging
+import os
+import threading
+import time
+import streamlit as st
+from pymongo import MongoClient
+from pymongo.errors import BulkWriteError, ConnectionFailure
+
+logger = logging.getLogger(__name__)
+
+DATABASE_NAME = os.getenv("MONGODB_DATABASE", "Omnivia")
+RESPONSES_COLLECTION = "responses"
+MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "20"))
+MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "0"))
+SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000"))
+SOCKET_TIMEOUT_MS = int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "20000"))
+BULK_CHUNK_SIZE = 1000
+FEEDBACK_COLLECTION = "feedback"
+WRITE_BUFFER_FLUSH_SIZE = 1000
+WRITE_BUFFER_FLUSH_INTERVAL = 1.0
+WRITE_RETRIES = 3
+WRITE_RETRY_DELAY = 0.5
+
+
+def is_configured():
+    return bool(os.getenv("MONGODB_URI"))
+
+
+@st.cache_resource
+def get_client():
+    """One pooled MongoClient per process, created on first use."""
+    if not is_configured():
+        raise RuntimeError("MONGODB_URI is not set. Please set it to enable database features.")
+    logger.info("Creating MongoDB client (max pool size %d)", MAX_POOL_SIZE)
+    return MongoClient(
+        os.environ["MONGODB_URI"],
+        maxPoolSize=MAX_POOL_SIZE,
+        minPoolSize=MIN_POOL_SIZE,
+        serverSelectionTimeoutMS=SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=SOCKET_TIMEOUT_MS,
+        connect=False,
+    )
+
+
+def get_database():
+    return get_client().get_database(DATABASE_NAME)
+
+
+def get_collection(name):
+    return get_database().get_collection(name)
+
+
+def bulk_insert(collection, documents, chunk_size=BULK_CHUNK_SIZE):
+    """Inserts documents with unordered ``insert_many`` calls of at most ``chunk_size``.
+
+    Unordered writes let the server continue past individual failures such as
+    duplicate keys; those are logged and the number of inserted documents is returned.
+    """
+    if isinstance(collection, str):
+        collection = get_collection(collection)
+    inserted = 0
+    for start in range(0, len(documents), chunk_size):
+        chunk = documents[start:start + chunk_size]
+        try:
+            inserted += len(collection.insert_many(chunk, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            inserted += e.details.get("nInserted", 0)
+            logger.error(f"Bulk insert into {collection.name} had {len(e.details.get('writeErrors', []))} write errors")
+    return inserted
+
+
+class WriteBehindBuffer:
+    """Queues documents for a collection and writes them in bulk from a background thread.
+
+    A flush happens once ``flush_size`` documents are queued, every
+    ``flush_interval`` seconds, on ``flush()`` and at interpreter exit.
+    Connection failures are retried with backoff; insert_many stamps ``_id``
+    on the documents, so a retried batch cannot insert duplicates.
+    """
+
+    def __init__(self, collection_name, flush_size=WRITE_BUFFER_FLUSH_SIZE, flush_interval=WRITE_BUFFER_FLUSH_INTERVAL, retries=WRITE_RETRIES):
+        self.collection_name = collection_name
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self._queue = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._metrics = {"flushes": 0, "written": 0, "failed": 0, "retries": 0, "last_flush_ms": 0.0, "max_flush_ms": 0.0}
+        self._thread = threading.Thread(target=self._run, name=f"omnivia-write-{collection_name}", daemon=True)
+        self._thread.start()
+
+    def add(self, document):
+        self.add_many([document])
+
+    def add_many(self, documents):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"Write buffer for {self.collection_name} is closed")
+            self._queue.extend(documents)
+            if len(self._queue) >= self.flush_size:
+                self._cond.notify()
+
+    def flush(self):
+        """Writes everything queued so far; returns the number of documents inserted."""
+        with self._write_lock:
+            with self._cond:
+                batch, self._queue = self._queue, []
+            if not batch:
+                return 0
+            started = time.perf_counter()
+            inserted = self._write(batch)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._cond:
+                self._metrics["flushes"] += 1
+                self._metrics["written"] += inserted
+                self._metrics["last_flush_ms"] = elapsed_ms
+                self._metrics["max_flush_ms"] = max(self._metrics["max_flush_ms"], elapsed_ms)
+            return inserted
+
+    def _write(self, batch):
+        for attempt in range(self.retries + 1):
+            try:
+                return bulk_insert(get_collection(self.collection_name), batch, self.flush_size)
+            except ConnectionFailure as e:
+                if attempt == self.retries:
+                    logger.error(f"Dropping {len(batch)} documents for {self.collection_name} after {attempt + 1} attempts: {str(e)}")
+                    with self._cond:
+                        self._metrics["failed"] += len(batch)
+                    return 0
+                with self._cond:
+                    self._metrics["retries"] += 1
+                time.sleep(WRITE_RETRY_DELAY * 2 ** attempt)
+            except Exception as e:
+                logger.error(f"Error writing {len(batch)} documents to {self.collection_name}: {str(e)}")
+                with self._cond:
+                    self._metrics["failed"] += len(batch)
+                return 0
+
+    def metrics(self):
+        with self._cond:
+            return dict(self._metrics, queue_depth=len(self._queue), collection=self.collection_name)
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            with self._cond:
+                while not self._closed and len(self._queue) < self.flush_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+            deadline = time.monotonic() + self.flush_interval
+
+
+_write_buffers = {}
+_write_buffers_lock = threading.Lock()
+
+
+def get_write_buffer(collection_name):
+    """Process-wide write-behind buffer for a collection, flushed at interpreter exit."""
+    with _write_buffers_lock:
+        buffer = _write_buffers.get(collection_name)
+        if buffer is None:
+            buffer = WriteBehindBuffer(collection_name)
+            atexit.register(buffer.close)
+            _write_buffers[collection_name] = buffer
+        return buffer
+
+
+def flush_all():
+    with _write_buffers_lock:
+        buffers = list(_write_buffers.values())
+    return sum(buffer.flush() for buffer in buffers)
+
+
+def write_buffer_metrics():
+    with _write_buffers_lock:
+        buffers = list(_write_buffers.values())
+    return [buffer.metrics() for buffer in buffers]
@@ -0,0 +1,103 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from modules import instrumentation
+
+logger = logging.getLogger(__name__)
+
+EVENT_LOG_PATH = os.getenv("OMNIVIA_EVENT_LOG", "omnivia_events.jsonl")
+MAX_BATCH = 500
+FLUSH_INTERVAL = 2.0
+
+
+class EventLog:
+    """Append-only JSONL event sink that buffers in memory and flushes from a background thread."""
+
+    def __init__(self, path, max_batch=MAX_BATCH, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="omnivia-event-log", daemon=True)
+        self._thread.start()
+
+    def log_event(self, name, event, source):
+        self.log_events(name, [event], source)
+
+    @instrumentation.timed("event_log")
+    def log_events(self, name, events, source):
+        timestamp = datetime.now(timezone.utc).isoformat()
+        records = [{"timestamp": timestamp, "name": name, "source": source, "event": event} for event in events]
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Event log is closed")
+            self._buffer.extend(records)
+            if len(self._buffer) >= self.max_batch:
+                self._cond.notify()
+
+    def flush(self):
+        with self._cond:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in batch)
+        # Serialise writers so batches are never interleaved within the file.
+        with self._write_lock:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+            except OSError as e:
+                logger.error(f"Error writing {len(batch)} events to {self.path}: {str(e)}")
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            with self._cond:
+                while not self._closed and len(self._buffer) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+            deadline = time.monotonic() + self.flush_interval
+
+
+_event_log = None
+_event_log_lock = threading.Lock()
+
+
+def get_event_log():
+    """Process-wide event log, started on first use and flushed at interpreter exit."""
+    global _event_log
+    with _event_log_lock:
+        if _event_log is None:
+            _event_log = EventLog(EVENT_LOG_PATH)
+            atexit.register(_event_log.close)
+        return _event_log
+
+
+def log_event(name, event, source):
+    get_event_log().log_event(name, event, source)
+
+
+def log_events(name, events, source):
+    get_event_log().log_events(name, events, source)
@@ -0,0 +1,137 @@
+import logging
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import pandas as pd
+from modules import simulation
+
+logger = logging.getLogger(__name__)
+
+BOOTSTRAP_SAMPLES = 2000
+# Resamples per shard. Shards are fixed-size, so intervals do not depend on worker count.
+BOOTSTRAP_SHARD_SIZE = 1000
+# Above this many drawn cells (resamples x price points) "auto" runs shards on a process pool.
+PARALLEL_THRESHOLD = 2_000_000
+
+
+def choices_from_wtp(price_points, willingness_to_pay):
+    """Index of the highest price point each respondent would buy at, or -1 for none."""
+    prices = np.asarray(price_points, dtype=np.float64)
+    order = np.argsort(prices)
+    wtp = np.asarray(willingness_to_pay, dtype=np.float64)
+    idx = np.searchsorted(prices[order], wtp, side="right") - 1
+    return np.where(idx >= 0, order[np.clip(idx, 0, None)], -1)
+
+
+def intent_counts(choices, num_prices):
+    """Respondents whose highest acceptable price is each price point, in one bincount pass."""
+    choices = np.asarray(choices, dtype=np.int64)
+    valid = (choices >= 0) & (choices < num_prices)
+    return np.bincount(choices[valid], minlength=num_prices)
+
+
+def demand_shares(counts_by_price, num_respondents):
+    """Share of respondents buying at each price of an ascending price list.
+
+    Anyone whose highest acceptable price is p_j also buys at every p_i <= p_j,
+    so demand is the reverse cumulative sum of the counts. Works row-wise on 2-D input.
+    """
+    counts = np.asarray(counts_by_price)
+    willing = np.flip(np.cumsum(np.flip(counts, axis=-1), axis=-1), axis=-1)
+    return willing / max(num_respondents, 1)
+
+
+def fit_demand_curve(prices, shares):
+    """Least-squares linear demand curve ``share = intercept + slope * price``."""
+    if len(prices) < 2:
+        return float(shares[0]) if len(shares) else 0.0, 0.0
+    slope, intercept = np.polyfit(prices, shares, 1)
+    return float(intercept), float(slope)
+
+
+def fitted_optimal_price(prices, intercept, slope):
+    """Revenue-maximising price of the linear curve, clipped to the tested range."""
+    if slope >= 0:
+        return float(np.max(prices))
+    return float(np.clip(-intercept / (2 * slope), np.min(prices), np.max(prices)))
+
+
+def _bootstrap_shard(probabilities, num_respondents, size, seed_seq):
+    rng = np.random.default_rng(seed_seq)
+    return rng.multinomial(num_respondents, probabilities, size=size)
+
+
+def bootstrap_counts(counts, num_none, samples=BOOTSTRAP_SAMPLES, seed=None, executor="auto", max_workers=None):
+    """Resampled intent counts, one row per bootstrap replicate.
+
+    Resampling respondents with replacement is a multinomial draw over the
+    answer categories, so each replicate costs O(price points) rather than
+    O(respondents).
+    """
+    counts = np.asarray(counts, dtype=np.int64)
+    num_respondents = int(counts.sum() + num_none)
+    probabilities = np.append(counts, num_none) / max(num_respondents, 1)
+    sizes = [min(BOOTSTRAP_SHARD_SIZE, samples - start) for start in range(0, samples, BOOTSTRAP_SHARD_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if executor == "auto":
+        executor = "process" if samples * len(probabilities) > PARALLEL_THRESHOLD and len(sizes) > 1 else "serial"
+    if executor == "serial":
+        shards = [_bootstrap_shard(probabilities, num_respondents, size, s) for size, s in zip(sizes, seeds, strict=True)]
+    else:
+        pool = simulation.get_executor(executor, max_workers)
+        try:
+            futures = [pool.submit(_bootstrap_shard, probabilities, num_respondents, size, s) for size, s in zip(sizes, seeds, strict=True)]
+            shards = [future.result() for future in futures]
+        except BrokenProcessPool:
+            simulation.discard_executor(pool)
+            raise
+    return np.concatenate(shards)[:, :-1] if shards else np.empty((0, len(counts)), dtype=np.int64)
+
+
+def gabor_granger(price_points, choices, samples=BOOTSTRAP_SAMPLES, confidence=0.95, seed=None, executor="auto", max_workers=None):
+    """Gabor-Granger demand curve, revenue-maximising price and bootstrap intervals.
+
+    ``choices`` holds, per respondent, the index into ``price_points`` of the
+    highest price they would buy at, or -1 if they would buy at none.
+    """
+    choices = np.asarray(choices, dtype=np.int64)
+    counts = intent_counts(choices, len(price_points))
+    return gabor_granger_from_counts(price_points, counts, int(choices.size - counts.sum()), samples, confidence, seed, executor, max_workers)
+
+
+def gabor_granger_from_counts(price_points, counts, num_none, samples=BOOTSTRAP_SAMPLES, confidence=0.95, seed=None, executor="auto", max_workers=None):
+    """``gabor_granger`` on pre-aggregated intent counts, e.g. from a streaming scan."""
+    prices = np.asarray(price_points, dtype=np.float64)
+    order = np.argsort(prices)
+    counts = np.asarray(counts, dtype=np.int64)[order]
+    num_respondents = int(counts.sum() + num_none)
+    sorted_prices = prices[order]
+
+    shares = demand_shares(counts, num_respondents)
+    revenue = sorted_prices * shares
+    best = int(np.argmax(revenue))
+    intercept, slope = fit_demand_curve(sorted_prices, shares)
+
+    result = {
+        "table": pd.DataFrame({
+            "Price": sorted_prices,
+            "Intent Count": counts,
+            "Demand Share": shares,
+            "Revenue Index": revenue,
+        }),
+        "respondents": num_respondents,
+        "optimal_price": float(sorted_prices[best]),
+        "optimal_revenue": float(revenue[best]),
+        "demand_curve": {"intercept": intercept, "slope": slope},
+        "fitted_optimal_price": fitted_optimal_price(sorted_prices, intercept, slope),
+    }
+    if samples and num_respondents:
+        alpha = (1 - confidence) / 2
+        boot_shares = demand_shares(bootstrap_counts(counts, num_none, samples, seed, executor, max_workers), num_respondents)
+        boot_revenue = sorted_prices * boot_shares
+        boot_best = sorted_prices[np.argmax(boot_revenue, axis=1)]
+        share_low, share_high = np.quantile(boot_shares, [alpha, 1 - alpha], axis=0)
+        result["table"]["Share Lower"] = share_low
+        result["table"]["Share Upper"] = share_high
+        result["optimal_price_ci"] = tuple(float(q) for q in np.quantile(boot_best, [alpha, 1 - alpha]))
+        result["optimal_revenue_ci"] = tuple(float(q) for q in np.quantile(boot_revenue.max(axis=1), [alpha, 1 - alpha]))
+    return result
@@ -0,0 +1,88 @@
+import logging
+import math
+import numpy as np
+from modules import analytics, gabor_granger
+
+logger = logging.getLogger(__name__)
+
+PRICE_RESPONSE_FILTER = {"type": "price_sensitivity"}
+THRESHOLD_FIELDS = ("too_cheap", "cheap", "expensive", "too_expensive")
+PRICE_FIELDS = THRESHOLD_FIELDS + ("willingness_to_pay",)
+INGEST_BATCH_SIZE = 10_000
+
+
+def iter_price_batches(collection, query=None, batch_size=INGEST_BATCH_SIZE, fields=PRICE_FIELDS):
+    """Streams price responses as dicts of float arrays, ``batch_size`` documents at a time.
+
+    Only ``fields`` are projected on the server and the cursor fetches in
+    batches of the same size. Missing or non-numeric values decode to NaN. The
+    yielded arrays are reused, so consume each batch before requesting the next.
+    """
+    projection = dict.fromkeys(fields, 1)
+    projection["_id"] = 0
+    cursor = collection.find(PRICE_RESPONSE_FILTER if query is None else query, projection, batch_size=batch_size)
+    columns = {field: np.empty(batch_size, dtype=np.float64) for field in fields}
+    filled = 0
+    for doc in cursor:
+        for field, column in columns.items():
+            value = doc.get(field)
+            try:
+                column[filled] = math.nan if value is None else value
+            except (TypeError, ValueError):
+                column[filled] = math.nan
+        filled += 1
+        if filled == batch_size:
+            yield columns
+            filled = 0
+    if filled:
+        yield {field: column[:filled] for field, column in columns.items()}
+
+
+def price_bounds(collection, query=None, fields=THRESHOLD_FIELDS):
+    """Lowest and highest threshold price across ``fields``, computed on the server."""
+    group = {"_id": None}
+    for field in fields:
+        group[f"{field}_min"] = {"$min": f"${field}"}
+        group[f"{field}_max"] = {"$max": f"${field}"}
+    rows = list(collection.aggregate([{"$match": PRICE_RESPONSE_FILTER if query is None else query}, {"$group": group}]))
+    if not rows:
+        return None
+    lows = [rows[0][f"{field}_min"] for field in fields if isinstance(rows[0].get(f"{field}_min"), (int, float))]
+    highs = [rows[0][f"{field}_max"] for field in fields if isinstance(rows[0].get(f"{field}_max"), (int, float))]
+    if not lows or not highs:
+        return None
+    return float(min(lows)), float(max(highs))
+
+
+def stream_price_sensitivity(collection, price_points, query=None, batch_size=INGEST_BATCH_SIZE,
+                             grid_points=analytics.VW_GRID_POINTS, **gabor_granger_kwargs):
+    """Runs Van Westendorp and Gabor-Granger over a collection in one streaming pass over the responses.
+
+    The Van Westendorp price grid comes from a separate server-side ``$group``
+    over the same filter (``price_bounds``) that runs before the stream.
+    Memory stays flat in the number of responses: each batch is folded into
+    per-price histograms and intent counts and then discarded. Returns
+    ``(van_westendorp, gabor_granger)``; either is None when no responses
+    carry the fields it needs.
+    """
+    bounds = price_bounds(collection, query)
+    vw_acc = analytics.VanWestendorpAccumulator(np.linspace(bounds[0], bounds[1], grid_points)) if bounds else None
+    counts = np.zeros(len(price_points), dtype=np.int64)
+    num_none = 0
+    batches = 0
+    for batch in iter_price_batches(collection, query, batch_size):
+        batches += 1
+        if vw_acc is not None:
+            vw_acc.update(*(batch[field] for field in THRESHOLD_FIELDS))
+        wtp = batch["willingness_to_pay"]
+        wtp = wtp[np.isfinite(wtp)]
+        choices = gabor_granger.choices_from_wtp(price_points, wtp)
+        counts += gabor_granger.intent_counts(choices, len(price_points))
+        num_none += int(np.count_nonzero(choices < 0))
+    logger.info("Streamed price responses in %d batches", batches)
+
+    vw = vw_acc.result() if vw_acc is not None and vw_acc.respondents else None
+    gg = None
+    if counts.sum() + num_none:
+        gg = gabor_granger.gabor_granger_from_counts(price_points, counts, num_none, **gabor_granger_kwargs)
+    return vw, gg
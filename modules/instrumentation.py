@@ -0,0 +1,224 @@
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# OMNIVIA_INSTRUMENTATION: unset or "0" disables spans, "1" records timings,
+# "alloc" also records tracemalloc allocation deltas (slower).
+INSTRUMENTATION_MODE = os.getenv("OMNIVIA_INSTRUMENTATION", "0")
+METRICS_PORT = int(os.getenv("OMNIVIA_METRICS_PORT", "0"))
+METRICS_DUMP_PATH = os.getenv("OMNIVIA_METRICS_DUMP", "omnivia_metrics.json")
+# Prometheus histogram bucket upper bounds, in seconds.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Recent samples kept per stage for the percentiles shown in the app.
+RECENT_SAMPLES = 1024
+
+_enabled = INSTRUMENTATION_MODE not in ("", "0")
+_track_allocations = INSTRUMENTATION_MODE == "alloc"
+
+
+class StageMetrics:
+    __slots__ = ("calls", "total_seconds", "bucket_counts", "allocated_bytes", "recent")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_seconds = 0.0
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.allocated_bytes = 0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+
+class MetricsRegistry:
+    """Per-stage call counts, latency histograms and allocation deltas."""
+
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, allocated_bytes=0):
+        bucket = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            metrics = self._stages.get(stage)
+            if metrics is None:
+                metrics = self._stages[stage] = StageMetrics()
+            metrics.calls += 1
+            metrics.total_seconds += seconds
+            metrics.bucket_counts[bucket] += 1
+            metrics.allocated_bytes += allocated_bytes
+            metrics.recent.append(seconds)
+
+    def snapshot(self):
+        """One summary row per stage, slowest total first."""
+        with self._lock:
+            stages = {name: (m.calls, m.total_seconds, m.allocated_bytes, list(m.bucket_counts), np.array(m.recent)) for name, m in self._stages.items()}
+        rows = []
+        for name, (calls, total, allocated, buckets, recent) in stages.items():
+            rows.append({
+                "stage": name,
+                "calls": calls,
+                "total_s": total,
+                "mean_ms": total / calls * 1000 if calls else 0.0,
+                "p50_ms": float(np.percentile(recent, 50)) * 1000 if len(recent) else 0.0,
+                "p95_ms": float(np.percentile(recent, 95)) * 1000 if len(recent) else 0.0,
+                "allocated_kb": allocated / 1024,
+                "buckets": buckets,
+            })
+        return sorted(rows, key=lambda row: row["total_s"], reverse=True)
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+    def prometheus_text(self):
+        """Metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP omnivia_stage_duration_seconds Latency of instrumented pipeline stages.",
+            "# TYPE omnivia_stage_duration_seconds histogram",
+        ]
+        snapshot = self.snapshot()
+        for row in snapshot:
+            stage = row["stage"].replace("\\", "\\\\").replace('"', '\\"')
+            cumulative = 0
+            for bound, count in zip((*LATENCY_BUCKETS, "+Inf"), row["buckets"], strict=True):
+                cumulative += count
+                lines.append(f'omnivia_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'omnivia_stage_duration_seconds_sum{{stage="{stage}"}} {row["total_s"]}')
+            lines.append(f'omnivia_stage_duration_seconds_count{{stage="{stage}"}} {row["calls"]}')
+        # A net tracemalloc delta can be negative, so this is a gauge rather than a counter.
+        lines.append("# HELP omnivia_stage_allocated_bytes Net bytes allocated process-wide while instrumented stages ran.")
+        lines.append("# TYPE omnivia_stage_allocated_bytes gauge")
+        for row in snapshot:
+            stage = row["stage"].replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'omnivia_stage_allocated_bytes{{stage="{stage}"}} {int(row["allocated_kb"] * 1024)}')
+        return "\n".join(lines) + "\n"
+
+    def dump_json(self, path=METRICS_DUMP_PATH):
+        rows = self.snapshot()
+        for row in rows:
+            row["bucket_bounds"] = [*LATENCY_BUCKETS, "+Inf"]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"generated": time.time(), "stages": rows}, f, indent=2)
+        os.replace(tmp_path, path)
+        return path
+
+
+registry = MetricsRegistry()
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    __slots__ = ("stage", "start", "allocated")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.allocated = tracemalloc.get_traced_memory()[0] if _track_allocations else None
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        allocated = 0
+        if self.allocated is not None and tracemalloc.is_tracing():
+            allocated = tracemalloc.get_traced_memory()[0] - self.allocated
+        registry.record(self.stage, elapsed, allocated)
+        return False
+
+
+def span(stage):
+    """Context manager timing a pipeline stage; a shared no-op when instrumentation is off."""
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(stage)
+
+
+def timed(stage):
+    """Decorator form of ``span``; when disabled the only cost is one flag check per call."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def is_enabled():
+    return _enabled
+
+
+def tracks_allocations():
+    return _track_allocations
+
+
+def configure(enabled, track_allocations=False):
+    """Turns instrumentation on or off at runtime."""
+    global _enabled, _track_allocations
+    _enabled = enabled
+    _track_allocations = enabled and track_allocations
+    if _track_allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not _track_allocations and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.prometheus_text().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics endpoint: " + format, *args)
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def serve_metrics(port=METRICS_PORT, host="127.0.0.1"):
+    """Serves /metrics on a local port from a daemon thread; started at most once per process."""
+    global _server
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="omnivia-metrics", daemon=True).start()
+            logger.info("Serving Prometheus metrics on http://%s:%d/metrics", host, _server.server_address[1])
+        return _server.server_address[1]
+
+
+if _track_allocations:
+    tracemalloc.start()
+if _enabled and METRICS_PORT:
+    serve_metrics(METRICS_PORT)
@@ -0,0 +1,245 @@
+import json
+import logging
+import os
+import pickle
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from modules import events, instrumentation, population as population_engine, result_cache, segments, simulation
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = os.getenv("OMNIVIA_JOBS_DIR", ".omnivia_jobs")
+# Sweeps running at once; each one works through its chunks in order.
+MAX_JOB_WORKERS = int(os.getenv("OMNIVIA_JOB_WORKERS", "2"))
+# Finished jobs are deleted once they are this many seconds old or beyond the newest MAX_KEPT_JOBS.
+MAX_JOB_AGE = float(os.getenv("OMNIVIA_JOB_MAX_AGE", str(7 * 24 * 3600)))
+MAX_KEPT_JOBS = int(os.getenv("OMNIVIA_MAX_KEPT_JOBS", "20"))
+ACTIVE_STATUSES = ("queued", "running")
+RESUMABLE_STATUSES = ("cancelled", "failed", "interrupted")
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class JobRunner:
+    """Runs demand sweeps on a background pool and persists every finished chunk.
+
+    Each job lives in its own directory: ``job.json`` with its inputs and
+    status, one pickle per finished chunk and ``result.pkl`` once complete.
+    A cancelled, failed or interrupted job (e.g. by a server restart) resumes
+    from the chunks already on disk. Scores are counter-based, so a resumed
+    sweep produces exactly what an uninterrupted one would. Jobs that are
+    not running are deleted once older than ``max_age`` seconds or beyond
+    the newest ``max_kept``.
+    """
+
+    def __init__(self, directory=JOBS_DIR, max_workers=MAX_JOB_WORKERS, chunk_size=None, max_age=MAX_JOB_AGE, max_kept=MAX_KEPT_JOBS):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.max_age = max_age
+        self.max_kept = max_kept
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="omnivia-job")
+        self._lock = threading.Lock()
+        self._active = {}
+        self._progress = {}
+        self.prune()
+
+    def submit(self, combinations, num_bots, male_percentage, income_range, interests_list, seed, job_id=None, details=None):
+        """Queues a sweep and returns its id; an existing job with the same id is resumed or reused."""
+        inputs = {
+            "combinations": [[feature, tagline, float(price)] for feature, tagline, price in combinations],
+            "num_bots": int(num_bots),
+            "male_percentage": male_percentage,
+            "income_range": list(income_range),
+            "interests_list": list(interests_list),
+            "seed": int(seed),
+        }
+        job_id = job_id or result_cache.inputs_key(**inputs)[:16]
+        with self._lock:
+            if job_id in self._active:
+                return job_id
+            meta = self._read_meta(job_id)
+            if meta is not None and meta["status"] == "done":
+                return job_id
+            if meta is None:
+                meta = {"id": job_id, "inputs": inputs, "details": details or {}, "created": time.time(), "bounds": None, "done_chunks": 0}
+            meta.update(status="queued", error=None, updated=time.time())
+            self._write_meta(meta)
+            cancel = self._active[job_id] = threading.Event()
+        self._pool.submit(self._run, job_id, cancel)
+        self.prune()
+        return job_id
+
+    def resume(self, job_id):
+        meta = self._read_meta(job_id)
+        if meta is None:
+            raise KeyError(job_id)
+        return self.submit(**meta["inputs"], job_id=job_id, details=meta["details"])
+
+    def cancel(self, job_id):
+        """Asks a queued or running job to stop after its current chunk."""
+        with self._lock:
+            event = self._active.get(job_id)
+        if event is None:
+            return False
+        event.set()
+        return True
+
+    def has_active(self):
+        """Whether any job is queued or running in this process; reads nothing from disk."""
+        with self._lock:
+            return bool(self._active)
+
+    def prune(self):
+        """Deletes the directories of jobs past the retention limits. Returns the ids removed."""
+        if not os.path.isdir(self.directory):
+            return []
+        now = time.time()
+        metas = []
+        for job_id in os.listdir(self.directory):
+            try:
+                meta = self._read_meta(job_id)
+            except (ValueError, OSError):
+                meta = None
+            metas.append((job_id, meta))
+        metas.sort(key=lambda item: item[1]["created"] if item[1] else 0.0, reverse=True)
+        removed = []
+        for rank, (job_id, meta) in enumerate(metas):
+            with self._lock:
+                if job_id in self._active:
+                    continue
+                if meta is not None and rank < self.max_kept and now - meta["updated"] <= self.max_age:
+                    continue
+                shutil.rmtree(os.path.join(self.directory, job_id), ignore_errors=True)
+            removed.append(job_id)
+        if removed:
+            logger.info("Removed %d expired background jobs", len(removed))
+        return removed
+
+    def status(self, job_id):
+        meta = self._read_meta(job_id)
+        if meta is None:
+            raise KeyError(job_id)
+        with self._lock:
+            active = job_id in self._active
+            done, total = self._progress.get(job_id, (meta["done_chunks"], len(meta["bounds"] or [])))
+        status = meta["status"]
+        if status in ACTIVE_STATUSES and not active:
+            status = "interrupted"  # Left running by a previous server process.
+        return {
+            "id": job_id,
+            "status": status,
+            "done_chunks": done,
+            "total_chunks": total,
+            "progress": done / total if total else 0.0,
+            "combinations": len(meta["inputs"]["combinations"]),
+            "details": meta["details"],
+            "error": meta.get("error"),
+            "created": meta["created"],
+            "updated": meta["updated"],
+        }
+
+    def jobs(self, limit=None):
+        """Status of the jobs on disk, newest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        statuses = []
+        for job_id in os.listdir(self.directory):
+            try:
+                statuses.append(self.status(job_id))
+            except (KeyError, ValueError, OSError):
+                continue
+        statuses.sort(key=lambda job: job["created"], reverse=True)
+        return statuses[:limit]
+
+    def result(self, job_id):
+        """``(df, SegmentedDemand)`` of a finished job, or None."""
+        try:
+            with open(self._path(job_id, "result.pkl"), "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _run(self, job_id, cancel):
+        try:
+            meta = self._read_meta(job_id)
+            inputs = meta["inputs"]
+            combinations = [tuple(combo) for combo in inputs["combinations"]]
+            population = population_engine.generate_population(
+                inputs["num_bots"], inputs["male_percentage"], inputs["income_range"], inputs["interests_list"], seed=inputs["seed"],
+            )
+            index = segments.SegmentIndex(population)
+            # Bounds are fixed on the first run so that saved chunks line up on resume.
+            bounds = [tuple(b) for b in meta["bounds"]] if meta["bounds"] else simulation.chunk_bounds(len(combinations), len(population), self.chunk_size)
+            saved = {start for start, _ in bounds if os.path.exists(self._chunk_path(job_id, start))}
+            self._update(job_id, status="running", bounds=bounds, done_chunks=len(saved))
+            self._set_progress(job_id, len(saved), len(bounds))
+
+            keys = simulation.cell_keys(combinations, inputs["seed"])
+            for start, stop in bounds:
+                if start in saved:
+                    continue
+                if cancel.is_set():
+                    self._update(job_id, status="cancelled", done_chunks=len(saved))
+                    return
+                with instrumentation.span("job_chunk"):
+                    result = simulation.segment_demand_scores(keys[start:stop], len(population), index.codes, len(index))
+                _write_atomic(self._chunk_path(job_id, start), pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+                saved.add(start)
+                self._set_progress(job_id, len(saved), len(bounds))
+
+            scores = np.empty(len(combinations), dtype=np.float64)
+            sums = np.empty((len(combinations), len(index)), dtype=np.float32)
+            for start, stop in bounds:
+                with open(self._chunk_path(job_id, start), "rb") as f:
+                    scores[start:stop], sums[start:stop] = pickle.load(f)
+            df = simulation.to_frame(combinations, scores)
+            segmented = segments.SegmentedDemand(df[simulation.RESULT_COLUMNS[:3]], sums, index)
+            _write_atomic(self._path(job_id, "result.pkl"), pickle.dumps((df, segmented), protocol=pickle.HIGHEST_PROTOCOL))
+            for start, _ in bounds:
+                os.remove(self._chunk_path(job_id, start))
+            self._update(job_id, status="done", done_chunks=len(bounds))
+            events.log_events("demand_simulation", df.to_dict(orient="records"), source="demand_meter")
+            logger.info("Job %s simulated %d combinations with seed %d", job_id, len(df), inputs["seed"])
+        except Exception as e:
+            logger.error(f"Error in simulation job {job_id}: {str(e)}")
+            events.log_event("demand_simulation_error", {"Job": job_id, "Error": str(e)}, source="demand_meter")
+            self._update(job_id, status="failed", error=str(e))
+        finally:
+            with self._lock:
+                self._active.pop(job_id, None)
+                self._progress.pop(job_id, None)
+
+    def _set_progress(self, job_id, done, total):
+        with self._lock:
+            self._progress[job_id] = (done, total)
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            meta = self._read_meta(job_id)
+            meta.update(fields, updated=time.time())
+            self._write_meta(meta)
+
+    def _path(self, job_id, name):
+        return os.path.join(self.directory, job_id, name)
+
+    def _chunk_path(self, job_id, start):
+        return self._path(job_id, f"chunk-{start}.pkl")
+
+    def _read_meta(self, job_id):
+        try:
+            with open(self._path(job_id, "job.json")) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, meta):
+        os.makedirs(os.path.join(self.directory, meta["id"]), exist_ok=True)
+        _write_atomic(self._path(meta["id"], "job.json"), json.dumps(meta).encode())
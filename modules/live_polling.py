@@ -3,9 +3,79 @@ import pandas as pd
 import random
 import concurrent.futures
 import math
-from modules import utils, results, analytics
+import os
+from modules import utils, results, analytics, persona_store, personas, db, votes, bot_voting
 import time  # Ensure the time module is imported
 
+@st.cache_resource
+def get_vote_aggregator():
+    return votes.VoteAggregator()
+
+def show_poll_results(poll_id):
+    """Poll results; they only refresh every second while the poll is open."""
+    aggregator = get_vote_aggregator()
+    if aggregator.is_open(poll_id):
+        show_live_results(poll_id)
+    else:
+        # Final results are shown once; later reruns no longer track this poll.
+        st.session_state.pop("live_poll_id", None)
+        render_poll_results(aggregator, poll_id)
+
+@utils.auto_refresh(1.0)
+def show_live_results(poll_id):
+    aggregator = get_vote_aggregator()
+    if not aggregator.is_open(poll_id):
+        st.rerun()  # Back to the static render for the final results.
+    render_poll_results(aggregator, poll_id)
+
+def render_poll_results(aggregator, poll_id):
+    try:
+        poll = aggregator.poll(poll_id)
+    except KeyError:
+        st.info("This poll is no longer available.")
+        return
+    counts = aggregator.snapshot(poll_id)
+    remaining = int(poll["closes_at"] - time.time())
+    st.write(f"**Poll Results:** {poll['question']}")
+    st.bar_chart(pd.Series(counts, name="Votes"))
+    st.write(f"Total votes: {sum(counts.values())}")
+    st.write(f"Time remaining: {remaining} seconds" if remaining > 0 else "This poll is closed.")
+
+@st.cache_resource
+def get_persona_store():
+    return persona_store.PersonaStore()
+
+def persist_bot_responses(bot_data, survey_question):
+    """Queues one document per bot for the responses collection."""
+    records = bot_data.to_frame().to_dict(orient="records")
+    for record in records:
+        record["type"] = "bot_response"
+        record["survey_question"] = survey_question
+    db.get_write_buffer(db.RESPONSES_COLLECTION).add_many(records)
+    return len(records)
+
+def show_write_metrics():
+    metrics = db.write_buffer_metrics()
+    if metrics:
+        with st.sidebar.expander("Database Writes"):
+            st.dataframe(pd.DataFrame(metrics).set_index("collection"))
+
+def attach_personas(bot_data, income_range, interests_list):
+    """Attaches library personas to the bots, generating only those the library lacks."""
+    progress = st.progress(0.0, text="Preparing personas...")
+    total = len(bot_data)
+    done = [0]
+
+    def on_result(_index, _persona):
+        done[0] += 1
+        progress.progress(min(done[0] / total, 1.0), text=f"Generated {done[0]} new personas")
+
+    texts = get_persona_store().get_personas(total, income_range, interests_list, on_result=on_result)
+    progress.empty()
+    if not any(texts):
+        st.warning("No personas could be generated; bots will vote without one.")
+    return bot_data.assign(persona=texts)
+
 def run_live_polling():
     """Runs the Live Polling section of the app."""
     st.subheader("Live Polling")
@@ -18,24 +88,32 @@ def run_live_polling():
     followups = [st.sidebar.text_input(f"Enter follow-up question {i+1}:", "") for i in range(2)]
 
     # --- Live Polling Logic and Display ---
-    votes = {key: 0 for key in options.keys()}
+    aggregator = get_vote_aggregator()
     if st.button("Start Poll"):
         if not survey_question or not any(options.values()):
             st.warning("Please enter a question and options.")
         else:
-            selected_option = st.selectbox("Choose your option:", options.values())
-            if st.button("Vote"):
-                votes[selected_option] += 1
+            st.session_state["live_poll_id"] = aggregator.open_poll(survey_question, list(options.values()))
 
-            st.write(f"**Poll Results:**")
-            for option, count in votes.items():
-                st.write(f"- {option}: {count} votes")
-
-            # Simple timer (You'll likely replace this with real-time updates)
-            start_time = time.time()
-            while time.time() - start_time < 10: # 10 seconds for example
-                st.write(f"Time remaining: {10 - int(time.time() - start_time)} seconds")
-                st.experimental_rerun()
+    open_polls = {poll["id"]: poll for poll in aggregator.open_polls()}
+    poll_id = st.session_state.get("live_poll_id")
+    if open_polls:
+        ids = list(open_polls)
+        poll_id = st.selectbox(
+            "Open polls:", ids,
+            index=ids.index(poll_id) if poll_id in open_polls else 0,
+            format_func=lambda pid: open_polls[pid]["question"],
+        )
+        st.session_state["live_poll_id"] = poll_id
+        poll = open_polls[poll_id]
+        selected_option = st.radio("Choose your option:", poll["options"], key=f"choice_{poll_id}")
+        if st.button("Vote"):
+            try:
+                aggregator.vote(poll_id, selected_option)
+            except ValueError as e:
+                st.warning(str(e))
+    if poll_id:
+        show_poll_results(poll_id)
 
     # --- Live Polling Input (Demographics) ---
     st.sidebar.subheader("Specify Demographics")
@@ -45,7 +123,7 @@ def run_live_polling():
 
     # Interest badges
     interests = st.sidebar.text_input("Enter Interests (comma-separated):", placeholder="Golf, Yoga, Basketball")
-    interests_list = interests.split(",") if interests else []
+    interests_list = [i.strip() for i in interests.split(",")] if interests else []
 
     if interests_list:
         st.sidebar.markdown("### Interests:")
@@ -56,24 +134,40 @@ def run_live_polling():
             )
 
     num_bots = st.sidebar.number_input("Enter number of bots:", min_value=1, max_value=1000, value=100)
+    use_personas = st.sidebar.checkbox("Give bots AI personas", help="Reuses personas from the library and generates only the shortfall.")
+    llm_voting = use_personas and st.sidebar.checkbox("Let personas vote through the LLM", disabled=not os.getenv("OPENAI_API_KEY"))
 
     # Start button
     start_button = st.sidebar.button("Start Survey Simulation")
 
-    # Simulation settings
-    MAX_CONCURRENT_THREADS = 25
-    batch_size = 25
-    num_batches = math.ceil(num_bots / batch_size)
-
     # Survey simulation logic
     if start_button:
+        if not bot_voting.active_options(options):
+            st.warning("Please enter at least one option.")
+            return
         bot_data = utils.generate_survey_data(int(num_bots), male_percentage, income_range, interests_list)
+        if use_personas:
+            bot_data = attach_personas(bot_data, income_range, interests_list)
+
+        choices = None
+        if llm_voting:
+            num_batches = math.ceil(len(bot_data) / bot_voting.BATCH_SIZE)
+            with st.spinner(f"Collecting persona votes in {num_batches} batches..."):
+                choices = bot_voting.llm_choices(bot_data["persona"], survey_question, options, personas.get_llm())
+        bot_data = bot_voting.simulate_votes(bot_data, options, choices=choices)
 
         # Sentiment Analysis
-        sentiment_results = analytics.analyze_sentiment([data['persona'] for data in bot_data.values()])
-        st.write("### Sentiment Analysis")
-        sentiment_df = pd.DataFrame(sentiment_results)
-        st.dataframe(sentiment_df)
+        if "persona" in bot_data:
+            sentiment_llm = personas.get_llm() if os.getenv("OPENAI_API_KEY") else None
+            sentiment_results = analytics.analyze_sentiment(list(bot_data["persona"]), llm=sentiment_llm)
+            st.write("### Sentiment Analysis")
+            sentiment_df = pd.DataFrame(sentiment_results)
+            st.dataframe(sentiment_df)
+
+        if db.is_configured():
+            persist_bot_responses(bot_data, survey_question)
 
         # Display Results
-        results.display_survey_results(bot_data)
\ No newline at end of file
+        results.display_survey_results(bot_data, options, followups)
+
+    show_write_metrics()
\ No newline at end of file
@@ -0,0 +1,134 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from modules import personas
+
+logger = logging.getLogger(__name__)
+
+PERSONA_DB_PATH = os.getenv("OMNIVIA_PERSONA_DB", "personas.db")
+# Income ranges are matched in buckets of this many thousands.
+INCOME_BUCKET = 10
+# Rounds of generation used to top up personas that came back empty.
+GENERATION_ROUNDS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS personas (
+    id INTEGER PRIMARY KEY,
+    income_low INTEGER NOT NULL,
+    income_high INTEGER NOT NULL,
+    interests TEXT NOT NULL,
+    persona TEXT NOT NULL,
+    content_hash TEXT NOT NULL UNIQUE,
+    uses INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_personas_audience ON personas (income_low, income_high, interests, uses);
+"""
+
+
+def income_bucket(income_range):
+    return int(income_range[0]) // INCOME_BUCKET, int(income_range[1]) // INCOME_BUCKET
+
+
+def interests_key(interests):
+    """Order- and case-insensitive key for an interest set."""
+    return "|".join(sorted({i.strip().lower() for i in interests if i and i.strip()}))
+
+
+class PersonaStore:
+    """SQLite library of generated personas, indexed by income bucket and interest set."""
+
+    def __init__(self, path=PERSONA_DB_PATH):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    def _audience(self, income_range, interests):
+        low, high = income_bucket(income_range)
+        return low, high, interests_key(interests)
+
+    def count(self, income_range, interests):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT COUNT(*) FROM personas WHERE income_low = ? AND income_high = ? AND interests = ?",
+                self._audience(income_range, interests),
+            ).fetchone()
+        return row[0]
+
+    def add(self, income_range, interests, texts, uses=0):
+        """Stores personas for an audience, ignoring exact duplicates. Returns the number inserted."""
+        low, high, key = self._audience(income_range, interests)
+        now = time.time()
+        rows = [
+            (low, high, key, text, hashlib.sha256(f"{low}:{high}:{key}:{text}".encode()).hexdigest(), uses, now)
+            for text in texts if text
+        ]
+        with self._lock, self._conn:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO personas (income_low, income_high, interests, persona, content_hash, uses, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            return self._conn.total_changes - before
+
+    def draw(self, n, income_range, interests):
+        """Takes up to ``n`` distinct personas, least used first, and records the use."""
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT id, persona FROM personas WHERE income_low = ? AND income_high = ? AND interests = ? "
+                "ORDER BY uses, RANDOM() LIMIT ?",
+                (*self._audience(income_range, interests), int(n)),
+            ).fetchall()
+            self._conn.executemany("UPDATE personas SET uses = uses + 1 WHERE id = ?", [(row[0],) for row in rows])
+        return [row[1] for row in rows]
+
+    def get_personas(self, n, income_range, interests, generate=None, on_result=None):
+        """Returns exactly ``n`` personas, reusing stored ones and generating only the shortfall.
+
+        ``generate(count)`` defaults to ``personas.collect_personas`` for this
+        audience. Empty generations are retried for up to GENERATION_ROUNDS
+        rounds; any remaining gap is filled by repeating the personas obtained,
+        or with empty strings if there are none, and logged. If generation
+        fails, the personas that did arrive are stored before re-raising.
+        """
+        drawn = self.draw(n, income_range, interests)
+        logger.info("Persona library supplied %d of %d personas", len(drawn), n)
+        if len(drawn) >= n:
+            return drawn
+        arrived = []
+        if generate is None:
+            def record(index, persona):
+                arrived.append(persona)
+                if on_result is not None:
+                    on_result(index, persona)
+
+            def generate(count):
+                return personas.collect_personas(count, income_range, interests, on_result=record)
+        fresh = []
+        try:
+            for _ in range(GENERATION_ROUNDS):
+                shortfall = n - len(drawn) - len(fresh)
+                if shortfall <= 0:
+                    break
+                fresh += [text for text in generate(shortfall) if text]
+        except Exception:
+            saved = self.add(income_range, interests, fresh + arrived)
+            logger.warning("Persona generation failed; kept %d completed personas in the library", saved)
+            raise
+        self.add(income_range, interests, fresh, uses=1)
+        result = drawn + fresh
+        missing = n - len(result)
+        if missing > 0:
+            logger.warning("Padding %d of %d personas after %d generation rounds", missing, n, GENERATION_ROUNDS)
+            result += [result[i % len(result)] for i in range(missing)] if result else [""] * missing
+        return result
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -1,13 +1,28 @@
+import asyncio
+import functools
+import hashlib
+import logging
 import os
 import random
-from langchain_community.llms import OpenAI
+import time
+
+logger = logging.getLogger(__name__)
 
 # --- OpenAI API ---
-llm = OpenAI(temperature=0.7)
+@functools.lru_cache(maxsize=None)
+def get_llm():
+    """Shared LangChain OpenAI LLM, created on first use so importing this module stays cheap."""
+    from langchain_community.llms import OpenAI
+    return OpenAI(temperature=0.7)
 
-def generate_persona(income_range, interests):
-    """Generates a persona based on income and a list of interests."""
-    prompt = f"""Create a persona with the following elements:
+MAX_CONCURRENCY = 8
+REQUESTS_PER_SECOND = 5.0
+MAX_RETRIES = 3
+RETRY_BASE_DELAY = 0.5
+
+def build_persona_prompt(income_range, interests, rng=random):
+    """Builds the persona prompt; ``rng`` controls the sampled interest phrasing."""
+    return f"""Create a persona with the following elements:
     1. Identity: Name, occupation, background
     2. Characteristics: Personality traits, communication style, beliefs, values
     3. Knowledge and expertise: Specific areas of knowledge or expertise
@@ -16,12 +31,126 @@ def generate_persona(income_range, interests):
     6. Emotional and relational aspects: Emotional state, level of empathy, approach to relationships
     7. Context: Specific setting or situation
 
-    The persona should have an income between ${income_range[0]}k and ${income_range[1]}k. 
+    The persona should have an income between ${income_range[0]}k and ${income_range[1]}k.
 
-    {random.choice(['They like ', 'They might like ', 'They dont really care for '])} {random.sample(interests, random.randint(0, len(interests)))}
+    {rng.choice(['They like ', 'They might like ', 'They dont really care for '])} {rng.sample(interests, rng.randint(0, len(interests)))}
 
     Provide the information in a structured format.
     """
 
-    response = llm(prompt)
-    return response.strip()
\ No newline at end of file
+def generate_persona(income_range, interests):
+    """Generates a persona based on income and a list of interests."""
+    response = get_llm()(build_persona_prompt(income_range, interests))
+    return response.strip()
+
+
+class LLMBackend:
+    """Runs a blocking LangChain-style ``llm(prompt)`` callable off the event loop."""
+
+    def __init__(self, model=None):
+        self.model = model
+
+    async def complete(self, prompt):
+        return await asyncio.to_thread(self.model or get_llm(), prompt)
+
+
+class FakePersonaBackend:
+    """Deterministic offline backend: the same prompt always yields the same persona."""
+
+    NAMES = ["Alex Carter", "Priya Shah", "Mateo Silva", "Grace Kim", "Jonas Weber", "Amara Obi"]
+    OCCUPATIONS = ["teacher", "software engineer", "nurse", "small business owner", "accountant", "designer"]
+    TRAITS = ["pragmatic", "curious", "cautious", "outgoing", "analytical", "easy-going"]
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    async def complete(self, prompt):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        h = int.from_bytes(hashlib.sha256(prompt.encode()).digest()[:8], "little")
+        name = self.NAMES[h % len(self.NAMES)]
+        occupation = self.OCCUPATIONS[(h >> 8) % len(self.OCCUPATIONS)]
+        trait = self.TRAITS[(h >> 16) % len(self.TRAITS)]
+        return f"Name: {name}\nOccupation: {occupation}\nPersonality: {trait}\n"
+
+
+class TokenBucket:
+    """Async token bucket allowing ``rate`` acquisitions per second with bursts up to ``capacity``."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+async def _generate_one(index, income_range, interests, backend, limiter, semaphore, retries, rng):
+    prompt = build_persona_prompt(income_range, interests, rng)
+    async with semaphore:
+        for attempt in range(retries + 1):
+            await limiter.acquire()
+            try:
+                response = await backend.complete(prompt)
+                return index, response.strip()
+            except Exception as e:
+                if attempt == retries:
+                    logger.error(f"Persona {index} failed after {retries + 1} attempts: {str(e)}")
+                    raise
+                delay = RETRY_BASE_DELAY * 2 ** attempt * (1 + random.random())
+                logger.warning(f"Persona {index} attempt {attempt + 1} failed ({str(e)}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+
+async def generate_personas(n, income_range, interests, backend=None, concurrency=MAX_CONCURRENCY,
+                            rate=REQUESTS_PER_SECOND, retries=MAX_RETRIES, seed=None):
+    """Generates ``n`` personas concurrently, yielding ``(index, persona)`` as each completes.
+
+    Requests are bounded by ``concurrency`` in flight and ``rate`` per second.
+    Failed requests are retried with exponential backoff; a persona that still
+    fails cancels the remaining work and re-raises.
+    """
+    backend = backend or LLMBackend()
+    limiter = TokenBucket(rate)
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = [
+        asyncio.create_task(_generate_one(
+            i, income_range, interests, backend, limiter, semaphore, retries,
+            random.Random(f"{seed}:{i}") if seed is not None else random.Random(),
+        ))
+        for i in range(n)
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def collect_personas(n, income_range, interests, on_result=None, **kwargs):
+    """Blocking wrapper around ``generate_personas`` returning personas in index order.
+
+    ``on_result(index, persona)`` is called as each persona arrives, e.g. to
+    update a progress bar.
+    """
+    async def _collect():
+        personas = [None] * n
+        async for index, persona in generate_personas(n, income_range, interests, **kwargs):
+            personas[index] = persona
+            if on_result is not None:
+                on_result(index, persona)
+        return personas
+
+    return asyncio.run(_collect())
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+from modules import instrumentation
+
+INCOME_BANDS = 4
+SAMPLE_SIZE = 5
+
+
+def income_bands(income, num_bands=INCOME_BANDS):
+    """Integer income-band code per bot (quantile bands) and a label per band."""
+    edges = np.unique(np.quantile(income, np.linspace(0, 1, num_bands + 1)[1:-1]))
+    codes = np.searchsorted(edges, income, side="right")
+    bounds = [income.min(), *edges, income.max()]
+    labels = [f"${low / 1000:,.0f}k-${high / 1000:,.0f}k" for low, high in zip(bounds[:-1], bounds[1:], strict=True)]
+    return codes, labels
+
+
+def _codes(values, categories):
+    return pd.Categorical(values, categories=categories).codes
+
+
+def crosstab(group_codes, group_labels, response_codes, letters):
+    """Counts of each response within each group, in a single bincount pass."""
+    k = len(letters)
+    counts = np.bincount(group_codes * k + response_codes, minlength=len(group_labels) * k)
+    return pd.DataFrame(counts.reshape(len(group_labels), k), index=group_labels, columns=letters)
+
+
+def group_means(group_codes, group_labels, values):
+    sums = np.bincount(group_codes, weights=values, minlength=len(group_labels))
+    counts = np.bincount(group_codes, minlength=len(group_labels))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return pd.Series(sums / counts, index=group_labels)
+
+
+@instrumentation.timed("poll_aggregation")
+def summarize_poll(bot_data, letters, followup_answers, sample_size=SAMPLE_SIZE, seed=None):
+    """Aggregates a voted population straight from its columns.
+
+    Returns response tallies, follow-up mean and mode, gender and income-band
+    crosstabs, the follow-up score mean per group, and indices of a random
+    persona sample.
+    """
+    response = _codes(bot_data["response"], letters)
+    score = np.asarray(bot_data["followup_1"], dtype=np.float64)
+    answers = _codes(bot_data["followup_2"], followup_answers)
+    answer_counts = np.bincount(answers[answers >= 0], minlength=len(followup_answers))
+
+    gender = bot_data.is_male.astype(np.int64)
+    gender_labels = ["Female", "Male"]
+    band, band_labels = income_bands(bot_data.income)
+
+    rng = np.random.default_rng(seed)
+    return {
+        "tally": pd.Series(np.bincount(response[response >= 0], minlength=len(letters)), index=letters, name="Votes"),
+        "followup_mean": float(score.mean()) if score.size else float("nan"),
+        "followup_mode": followup_answers[int(np.argmax(answer_counts))],
+        "by_gender": crosstab(gender, gender_labels, response, letters),
+        "by_income": crosstab(band, band_labels, response, letters),
+        "score_by_gender": group_means(gender, gender_labels, score),
+        "score_by_income": group_means(band, band_labels, score),
+        "sample": rng.choice(len(bot_data), size=min(sample_size, len(bot_data)), replace=False),
+    }
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+# Interests are stored as one bit per entry of interests_list in a uint64 mask.
+MAX_INTERESTS = 64
+INTERESTS_PER_BOT = 3
+
+
+class Population:
+    """Columnar table of simulated bots: one NumPy array per attribute."""
+
+    __slots__ = ("is_male", "income", "interest_mask", "interest_names", "extra")
+
+    def __init__(self, is_male, income, interest_mask, interest_names, extra=None):
+        self.is_male = is_male
+        self.income = income
+        self.interest_mask = interest_mask
+        self.interest_names = list(interest_names)
+        self.extra = dict(extra or {})
+
+    def __len__(self):
+        return len(self.income)
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __getitem__(self, name):
+        if name == "gender":
+            return self.gender
+        if name == "income":
+            return self.income
+        if name == "interests":
+            return self.interests
+        return self.extra[name]
+
+    @property
+    def columns(self):
+        return ["gender", "income", "interests", *self.extra]
+
+    @property
+    def gender(self):
+        return np.where(self.is_male, "male", "female")
+
+    @property
+    def interests(self):
+        """Decodes the interest bitmask into per-bot lists of names."""
+        if not self.interest_names:
+            return [[] for _ in range(len(self))]
+        bits = np.uint64(1) << np.arange(len(self.interest_names), dtype=np.uint64)
+        members = (self.interest_mask[:, None] & bits) != 0
+        names = np.array(self.interest_names, dtype=object)
+        return [list(names[row]) for row in members]
+
+    def row(self, index):
+        """One bot as a dict, decoding only that bot's interests."""
+        mask = int(self.interest_mask[index])
+        record = {
+            "gender": "male" if self.is_male[index] else "female",
+            "income": int(self.income[index]),
+            "interests": [name for bit, name in enumerate(self.interest_names) if mask >> bit & 1],
+        }
+        for name, values in self.extra.items():
+            record[name] = values[index]
+        return record
+
+    def has_interest(self, name):
+        """Boolean array of bots holding the given interest."""
+        bit = np.uint64(1) << np.uint64(self.interest_names.index(name))
+        return (self.interest_mask & bit) != 0
+
+    def assign(self, **columns):
+        """Returns a new table sharing these arrays with extra columns attached."""
+        for name, values in columns.items():
+            if len(values) != len(self):
+                raise ValueError(f"Column '{name}' has {len(values)} rows, expected {len(self)}")
+        return Population(self.is_male, self.income, self.interest_mask, self.interest_names, {**self.extra, **columns})
+
+    def to_frame(self):
+        df = pd.DataFrame({"gender": self.gender, "income": self.income, "interests": self.interests})
+        for name, values in self.extra.items():
+            df[name] = values
+        return df
+
+
+def generate_population(num_bots, male_percentage, income_range, interests_list, seed=None):
+    """Draws a whole bot population in one vectorized pass."""
+    if len(interests_list) > MAX_INTERESTS:
+        raise ValueError(f"At most {MAX_INTERESTS} interests are supported, got {len(interests_list)}")
+    rng = np.random.default_rng(seed)
+    num_bots = int(num_bots)
+
+    is_male = rng.random(num_bots) < male_percentage / 100
+    income = rng.integers(income_range[0], income_range[1], size=num_bots, endpoint=True, dtype=np.int64) * 1000
+
+    num_interests = len(interests_list)
+    per_bot = min(num_interests, INTERESTS_PER_BOT)
+    if per_bot == 0:
+        interest_mask = np.zeros(num_bots, dtype=np.uint64)
+    elif per_bot == num_interests:
+        interest_mask = np.full(num_bots, (1 << num_interests) - 1, dtype=np.uint64)
+    else:
+        # Argsorting uniform keys gives each bot an independent sample without replacement.
+        picks = np.argsort(rng.random((num_bots, num_interests)), axis=1)[:, :per_bot]
+        interest_mask = np.bitwise_or.reduce(np.uint64(1) << picks.astype(np.uint64), axis=1)
+
+    return Population(is_male, income, interest_mask, interests_list)
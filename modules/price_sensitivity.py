@@ -1,6 +1,47 @@
 import streamlit as st
 import pandas as pd
-import json
+import plotly.express as px
+import plotly.graph_objs as go
+import logging
+from modules import ingest, questions
+
+def display_van_westendorp(vw):
+    """Renders Van Westendorp price points and curves."""
+    points = vw["points"]
+    cols = st.columns(4)
+    for col, (label, name) in zip(cols, [("Marginal Cheapness", "PMC"), ("Optimal Price", "OPP"), ("Indifference Price", "IPP"), ("Marginal Expensiveness", "PME")], strict=True):
+        col.metric(f"{label} ({name})", f"${points[name]:.2f}")
+    st.write(f"Acceptable Price Range: ${vw['acceptable_range'][0]:.2f} - ${vw['acceptable_range'][1]:.2f}")
+    st.write(f"Optimal Price Range: ${vw['optimal_range'][0]:.2f} - ${vw['optimal_range'][1]:.2f}")
+    curves = vw["curves"].melt(id_vars="Price", var_name="Curve", value_name="Share of Respondents")
+    fig = px.line(curves, x="Price", y="Share of Respondents", color="Curve")
+    st.plotly_chart(fig, use_container_width=True)
+
+def display_gabor_granger(gg):
+    """Renders the Gabor-Granger demand curve, revenue optimum and intervals."""
+    table = gg["table"]
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Revenue-Maximising Price", f"${gg['optimal_price']:.2f}")
+    col2.metric("Fitted Optimal Price", f"${gg['fitted_optimal_price']:.2f}")
+    col3.metric("Respondents", gg["respondents"])
+    if "optimal_price_ci" in gg:
+        low, high = gg["optimal_price_ci"]
+        st.write(f"95% bootstrap interval for the optimal price: ${low:.2f} - ${high:.2f}")
+
+    fig = go.Figure()
+    error_y = None
+    if "Share Lower" in table:
+        error_y = {"type": "data", "symmetric": False, "array": table["Share Upper"] - table["Demand Share"], "arrayminus": table["Demand Share"] - table["Share Lower"]}
+    fig.add_bar(x=table["Price"], y=table["Demand Share"], name="Demand Share", error_y=error_y)
+    fig.add_scatter(x=table["Price"], y=table["Revenue Index"], name="Revenue Index", yaxis="y2", mode="lines+markers")
+    fig.update_layout(
+        title="Gabor-Granger Price Sensitivity",
+        xaxis_title="Price",
+        yaxis={"title": "Share Buying", "tickformat": ".0%"},
+        yaxis2={"title": "Revenue Index", "overlaying": "y", "side": "right"},
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(table)
 
 def run_price_sensitivity():
     """Runs the Price Sensitivity section of the app."""
@@ -27,31 +68,20 @@ def run_price_sensitivity():
         else:
             st.write(f"**Price Points:** {price_points}")
 
-            # Simulate retrieving responses from a database
-            responses = []  # Replace with actual database call
-            if responses:
-                # Placeholder for actual price sensitivity analysis
-                st.write("**Analysis Results:**")
-                for point in price_points:
-                    st.write(f"At ${point}, the demand is...")  # Placeholder for actual logic
+            # Stream stored price responses from MongoDB
+            try:
+                with st.spinner("Analyzing stored responses..."):
+                    vw, gg = ingest.stream_price_sensitivity(questions.get_responses_collection(), price_points)
+            except Exception as e:
+                logging.error(f"Error loading price responses: {str(e)}")
+                st.error(f"Error loading price responses: {str(e)}")
+                return
 
-                # Example of Van Westendorp Price Sensitivity Analysis
+            if vw is None and gg is None:
+                st.info("No price sensitivity responses have been collected yet.")
+            if vw is not None:
                 st.write("**Van Westendorp Price Sensitivity Analysis:**")
-                optimal_price_range = (min(price_points), max(price_points))  # Placeholder for actual analysis
-                st.write(f"Optimal Price Range: {optimal_price_range}")
-
-                # Example of Gabor-Granger Price Sensitivity Analysis
+                display_van_westendorp(vw)
+            if gg is not None:
                 st.write("**Gabor-Granger Price Sensitivity Analysis:**")
-                demand_at_price = {point: random.randint(50, 100) for point in price_points}  # Placeholder
-                st.write(f"Demand at Different Price Points: {demand_at_price}")
-
-                # Chart for Gabor-Granger Results
-                option = {
-                    "title": {"text": "Gabor-Granger Price Sensitivity", "left": "center"},
-                    "xAxis": {"type": "category", "data": price_points},
-                    "yAxis": {"type": "value"},
-                    "series": [
-                        {"data": list(demand_at_price.values()), "type": "bar", "showBackground": True, "backgroundStyle": {"color": 'rgba(180, 180, 180, 0.2)'}}
-                    ]
-                }
-                st.echarts(options=json.dumps(option), height="400px")
+                display_gabor_granger(gg)
@@ -1,11 +1,9 @@
-import os
 import streamlit as st
-from pymongo import MongoClient
+from modules import db
 
-# --- MongoDB Connection ---
-client = MongoClient(os.environ["MONGODB_URI"])
-db = client.get_database("Omnivia")
-responses_collection = db.get_collection("responses")
+def get_responses_collection():
+    """Survey questions and responses collection, connected on first use."""
+    return db.get_collection(db.RESPONSES_COLLECTION)
 
 def create_survey_question():
     """Creates a survey question section with question type selection and conditional logic."""
@@ -39,5 +37,8 @@ def create_survey_question():
                 "value": condition_value if condition_enabled else None
             }
         }
-        responses_collection.insert_one(question_data)  # Insert the question to the MongoDB collection
-        st.success("Question added successfully.")
\ No newline at end of file
+        if not db.is_configured():
+            st.error("MONGODB_URI is not set. Please set it to save survey questions.")
+        else:
+            db.get_write_buffer(db.RESPONSES_COLLECTION).add(question_data)  # Queue the question for the MongoDB collection
+            st.success("Question added successfully.")
\ No newline at end of file
@@ -0,0 +1,163 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.getenv("OMNIVIA_CACHE_DIR", ".omnivia_cache")
+MAX_MEMORY_ENTRIES = 32
+MAX_DISK_BYTES = 256 * 1024 * 1024
+
+
+def inputs_key(**inputs):
+    """Content hash of the inputs that determine a result."""
+    payload = json.dumps(inputs, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """Two-tier DataFrame cache: an in-memory LRU in front of Parquet files on disk.
+
+    Subclasses cache other values by overriding ``SUFFIX``, ``_load`` and ``_dump``.
+    """
+
+    SUFFIX = ".parquet"
+
+    def __init__(self, directory=CACHE_DIR, max_entries=MAX_MEMORY_ENTRIES, max_disk_bytes=MAX_DISK_BYTES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_enabled = max_disk_bytes > 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return self._memory[key].copy()
+        df = self._read_disk(key)
+        with self._lock:
+            if df is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            self._remember(key, df)
+        return df.copy()
+
+    def contains(self, key):
+        """Whether ``key`` is cached in either tier, without counting a lookup."""
+        with self._lock:
+            if key in self._memory:
+                return True
+        return self.disk_enabled and os.path.exists(self._path(key))
+
+    def record_miss(self):
+        """Counts a lookup answered elsewhere, e.g. when a companion cache lacks the entry."""
+        with self._lock:
+            self._stats["misses"] += 1
+
+    def put(self, key, df):
+        df = df.copy()
+        with self._lock:
+            self._remember(key, df)
+        self._write_disk(key, df)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, memory_entries=len(self._memory))
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        stats["disk_bytes"] = sum(size for _, size, _ in self._disk_entries())
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        for path, _, _ in self._disk_entries():
+            os.remove(path)
+
+    def _remember(self, key, df):
+        self._memory[key] = df
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}{self.SUFFIX}")
+
+    def _load(self, path):
+        return pd.read_parquet(path)
+
+    def _dump(self, df, path):
+        df.to_parquet(path, index=False)
+
+    def _read_disk(self, key):
+        if not self.disk_enabled:
+            return None
+        path = self._path(key)
+        try:
+            df = self._load(path)
+            os.utime(path)  # Mark as recently used for eviction.
+            return df
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache entry {path}: {str(e)}")
+            with contextlib.suppress(OSError):
+                os.remove(path)
+            return None
+
+    def _write_disk(self, key, df):
+        if not self.disk_enabled:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            self._dump(df, tmp_path)
+            os.replace(tmp_path, path)
+        except ImportError as e:
+            # No parquet engine installed; keep serving from memory only.
+            logger.warning(f"Disabling on-disk result cache: {str(e)}")
+            self.disk_enabled = False
+            return
+        except Exception as e:
+            logger.error(f"Error writing cache entry {path}: {str(e)}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._evict_disk()
+
+    def _disk_entries(self):
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for name in os.listdir(self.directory):
+            if name.endswith(self.SUFFIX):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict_disk(self):
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_disk_bytes:
+                break
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            total -= size
+            with self._lock:
+                self._stats["evictions"] += 1
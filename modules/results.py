@@ -1,24 +1,36 @@
 import streamlit as st
 import pandas as pd
-import random
+from modules import bot_voting, poll_aggregation
 
-def display_survey_results(bot_data):
+def display_survey_results(bot_data, options, followups):
     """Displays the survey results in a structured format."""
-    df = pd.DataFrame(bot_data)
-    response_tally = df['response'].value_counts()
+    letters = list(bot_voting.active_options(options))
+    summary = poll_aggregation.summarize_poll(bot_data, letters, list(bot_voting.FOLLOWUP_ANSWERS))
+    response_tally = summary["tally"]
     st.write("### Survey Results")
     st.bar_chart(response_tally)
 
     # Key Insights
     st.write("### Key Insights")
     most_popular = response_tally.idxmax()
-    st.write(f"**Most popular option**: {most_popular} ({options[f'option_{most_popular.lower()}']})")
-    st.write(f"**Average score for '{followups[0]}'**: {df['followups'].apply(lambda x: x[0]).mean():.2f}/10")
-    st.write(f"**Most common response to '{followups[1]}'**: {df['followups'].apply(lambda x: x[1]).mode()[0]}")
+    st.write(f"**Most popular option**: {most_popular} ({options[f'option_{most_popular}']})")
+    st.write(f"**Average score for '{followups[0]}'**: {summary['followup_mean']:.2f}/10")
+    st.write(f"**Most common response to '{followups[1]}'**: {summary['followup_mode']}")
+
+    # Demographic Breakdown
+    st.write("### Responses by Demographic")
+    col1, col2 = st.columns(2)
+    col1.write("**By gender (share of votes)**")
+    col1.dataframe(summary["by_gender"].div(summary["by_gender"].sum(axis=1), axis=0).style.format("{:.0%}"))
+    col2.write("**By income band (share of votes)**")
+    col2.dataframe(summary["by_income"].div(summary["by_income"].sum(axis=1), axis=0).style.format("{:.0%}"))
+    st.write(f"**Average score for '{followups[0]}' by group**")
+    st.dataframe(pd.concat([summary["score_by_gender"], summary["score_by_income"]]).rename("Score").round(2).to_frame().T)
 
     # Sample Personas
     st.write("### Sample Personas")
-    for i, (bot, data) in enumerate(random.sample(list(bot_data.items()), 5)):
+    for i, index in enumerate(summary["sample"]):
+        data = bot_data.row(index)
         with st.expander(f"Persona {i+1}"):
-            st.write(data['persona'])
-            st.write(f"Response: {data['response']}")
\ No newline at end of file
+            st.write(data['persona'] if 'persona' in data else f"{data['gender'].title()}, income ${data['income']:,}, interests: {', '.join(data['interests']) or 'none'}")
+            st.write(f"Response: {data['response']}")
@@ -0,0 +1,58 @@
+import importlib
+import logging
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Menu label -> (module, entry point). A section's module, and everything it
+# pulls in, is only imported the first time that page is opened.
+SECTIONS = {
+    "Demand Meter": ("modules.dashboard", "run_dashboard"),
+    "Price Sensitivity": ("modules.price_sensitivity", "run_price_sensitivity"),
+    "Live Polling": ("modules.live_polling", "run_live_polling"),
+}
+
+_profile = {}
+_profile_lock = threading.Lock()
+
+
+def timed_import(name):
+    """Imports ``name`` on first use and records how long that took.
+
+    The timing covers the module and every dependency it imported for the
+    first time; the third-party packages among those are recorded with it.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    before = set(sys.modules)
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    pulled_in = sorted(
+        key for key in set(sys.modules) - before
+        if "." not in key and not key.startswith("_") and key not in sys.stdlib_module_names
+    )
+    with _profile_lock:
+        _profile.setdefault(name, {"module": name, "import_ms": round(elapsed_ms, 1), "new_packages": ", ".join(pulled_in)})
+    logger.info("Imported %s in %.1f ms", name, elapsed_ms)
+    return module
+
+
+def load_section(label):
+    """Entry point of the section behind a menu label, importing its module if needed."""
+    module_name, entry_point = SECTIONS[label]
+    return getattr(timed_import(module_name), entry_point)
+
+
+def run_section(label):
+    load_section(label)()
+
+
+def import_profile():
+    """Per-module import timings in milliseconds, slowest first."""
+    with _profile_lock:
+        rows = [dict(row) for row in _profile.values()]
+    return sorted(rows, key=lambda row: row["import_ms"], reverse=True)
@@ -0,0 +1,180 @@
+import os
+import numpy as np
+import pandas as pd
+from modules import result_cache
+
+INCOME_DECILES = 10
+GENDERS = ("female", "male")
+# Per-segment sums take cells x segments x 4 bytes, e.g. ~33 MB for a 10,000-cell
+# grid over 1000 bots with 10 interests (~800 segments). A session's result, the
+# cache and a loaded job share one array, so only a few runs are kept in memory;
+# older ones are reloaded from the .npz files next to the Parquet results.
+MAX_CACHED_RUNS = 2
+MAX_SEGMENT_DISK_BYTES = int(os.getenv("OMNIVIA_SEGMENT_CACHE_BYTES", str(512 * 1024 * 1024)))
+
+
+class SegmentIndex:
+    """Pre-binned segment code per bot: income decile x gender x exact interest set.
+
+    Only segments that actually contain bots are kept, so there are never more
+    segments than bots.
+    """
+
+    def __init__(self, population, num_deciles=INCOME_DECILES):
+        income = population.income
+        edges = np.quantile(income, np.linspace(0, 1, num_deciles + 1)[1:-1]) if len(income) else np.empty(0)
+        decile = np.searchsorted(edges, income, side="right")
+        masks, mask_codes = np.unique(population.interest_mask, return_inverse=True)
+        combined = (decile * 2 + population.is_male.astype(np.int64)) * len(masks) + mask_codes
+        present, self.codes = np.unique(combined, return_inverse=True)
+
+        self.num_deciles = num_deciles
+        self.interest_names = list(population.interest_names)
+        self.decile = present // len(masks) // 2
+        self.is_male = (present // len(masks)) % 2 == 1
+        self.interest_mask = masks[present % len(masks)]
+        self.counts = np.bincount(self.codes, minlength=len(present))
+
+    @classmethod
+    def from_arrays(cls, codes, decile, is_male, interest_mask, counts, num_deciles, interest_names):
+        index = cls.__new__(cls)
+        index.codes = codes
+        index.decile = decile
+        index.is_male = is_male
+        index.interest_mask = interest_mask
+        index.counts = counts
+        index.num_deciles = int(num_deciles)
+        index.interest_names = list(interest_names)
+        return index
+
+    def __len__(self):
+        return len(self.counts)
+
+    def select(self, deciles=None, genders=None, interests=None):
+        """Boolean mask over segments; ``interests`` keeps segments holding any of them."""
+        keep = np.ones(len(self), dtype=bool)
+        if deciles:
+            keep &= np.isin(self.decile, [d - 1 for d in deciles])
+        if genders:
+            keep &= np.isin(self.is_male, [g == "male" for g in genders])
+        if interests:
+            bits = np.uint64(0)
+            for name in interests:
+                bits |= np.uint64(1) << np.uint64(self.interest_names.index(name))
+            keep &= (self.interest_mask & bits) != 0
+        return keep
+
+
+def segment_sums(scores, segment_codes, num_segments):
+    """(cells x segments) sums of a (cells x bots) score matrix, in one bincount pass."""
+    cells = scores.shape[0]
+    flat = (np.arange(cells)[:, None] * num_segments + segment_codes[None, :]).ravel()
+    sums = np.bincount(flat, weights=scores.ravel(), minlength=cells * num_segments)
+    return sums.reshape(cells, num_segments).astype(np.float32)
+
+
+class SegmentedDemand:
+    """Per-segment demand score sums for every cell of a sweep.
+
+    Any slice of the population can be scored from these sums without
+    rerunning the simulation.
+    """
+
+    def __init__(self, cells, sums, index):
+        self.cells = cells.reset_index(drop=True)
+        self.sums = sums
+        self.index = index
+
+    def copy(self):
+        return SegmentedDemand(self.cells, self.sums, self.index)
+
+    def save(self, file):
+        """Writes the cells, sums and segment index as a NumPy ``.npz`` archive."""
+        index = self.index
+        np.savez(
+            file,
+            features=self.cells["Feature"].to_numpy(dtype=str),
+            taglines=self.cells["Tagline"].to_numpy(dtype=str),
+            prices=self.cells["Price"].to_numpy(dtype=np.float64),
+            sums=self.sums,
+            codes=index.codes,
+            decile=index.decile,
+            is_male=index.is_male,
+            interest_mask=index.interest_mask,
+            counts=index.counts,
+            num_deciles=index.num_deciles,
+            interest_names=np.array(index.interest_names, dtype=str),
+        )
+
+    @classmethod
+    def load(cls, file):
+        with np.load(file, allow_pickle=False) as data:
+            cells = pd.DataFrame({"Feature": data["features"].astype(object), "Tagline": data["taglines"].astype(object), "Price": data["prices"]})
+            index = SegmentIndex.from_arrays(
+                data["codes"], data["decile"], data["is_male"], data["interest_mask"], data["counts"],
+                data["num_deciles"], data["interest_names"].tolist(),
+            )
+            return cls(cells, data["sums"], index)
+
+    def demand(self, deciles=None, genders=None, interests=None):
+        """Feature/Tagline/Price/Demand Score frame for the bots in the selected segments."""
+        keep = self.index.select(deciles, genders, interests)
+        bots = int(self.index.counts[keep].sum())
+        df = self.cells.copy()
+        df["Demand Score"] = self.sums[:, keep].sum(axis=1, dtype=np.float64) / bots if bots else np.nan
+        df["Bots"] = bots
+        return df
+
+    def by_dimension(self, dimension):
+        """Mean demand per income decile, gender or interest across all cells."""
+        totals = self.sums.sum(axis=0, dtype=np.float64)
+        cells = max(len(self.cells), 1)
+        if dimension == "decile":
+            labels = [f"D{d + 1}" for d in range(self.index.num_deciles)]
+            groups = [self.index.decile == d for d in range(self.index.num_deciles)]
+        elif dimension == "gender":
+            labels = [g.title() for g in GENDERS]
+            groups = [~self.index.is_male, self.index.is_male]
+        elif dimension == "interest":
+            labels = self.index.interest_names
+            groups = [self.index.select(interests=[name]) for name in labels]
+        else:
+            raise ValueError(f"Unknown segment dimension '{dimension}'")
+        rows = []
+        for label, keep in zip(labels, groups, strict=True):
+            bots = int(self.index.counts[keep].sum())
+            rows.append({"Segment": label, "Bots": bots, "Demand Score": totals[keep].sum() / (bots * cells) if bots else np.nan})
+        return pd.DataFrame(rows)
+
+
+def merge_segmented(previous, fresh, cells):
+    """Reorders reused and fresh per-cell sums to match the ``cells`` frame."""
+    parts = [part for part in (previous, fresh) if part is not None and len(part.cells)]
+    if not parts:
+        return None
+    keys = ["Feature", "Tagline", "Price"]
+    stacked = pd.concat([part.cells[keys] for part in parts], ignore_index=True)
+    sums = np.concatenate([part.sums for part in parts])
+    position = pd.Series(np.arange(len(stacked)), index=pd.MultiIndex.from_frame(stacked))
+    position = position[~position.index.duplicated(keep="last")]
+    rows = position.reindex(pd.MultiIndex.from_frame(cells[keys])).to_numpy()
+    return SegmentedDemand(cells[keys], sums[rows], parts[-1].index)
+
+
+class SegmentCache(result_cache.ResultCache):
+    """Per-segment sums keyed like the result cache and stored as ``.npz`` files next to its Parquet entries.
+
+    A result restored from disk after a restart is still sliceable without rerunning the sweep.
+    """
+
+    SUFFIX = ".segments.npz"
+
+    def __init__(self, directory=result_cache.CACHE_DIR, max_entries=MAX_CACHED_RUNS, max_disk_bytes=MAX_SEGMENT_DISK_BYTES):
+        super().__init__(directory, max_entries, max_disk_bytes)
+
+    def _load(self, path):
+        return SegmentedDemand.load(path)
+
+    def _dump(self, segmented, path):
+        with open(path, "wb") as f:
+            segmented.save(f)
@@ -0,0 +1,61 @@
+from dataclasses import dataclass, field
+from typing import Any, Optional
+import pandas as pd
+import streamlit as st
+
+DEMAND_STATE_KEY = "demand_session"
+
+
+@dataclass
+class DemandSession:
+    """Everything the Demand Meter has computed for one browser session.
+
+    Invalidation rules:
+    - storing a new result replaces ``df`` and ``segments`` and drops the
+      artifacts derived from the old result (``summary``, ``summary_error``
+      and ``figures``);
+    - a failed summary is kept in ``summary_error`` and only requested again
+      when the user asks to retry or a new result is stored;
+    - a failed calculation clears the result;
+    - editing the sidebar inputs keeps the result on screen, marked stale
+      until "Calculate Demand" is pressed again, and still available for
+      incremental reuse by ``population_key``;
+    - every other interaction (feedback, preferences, segment filters)
+      reuses the result and its artifacts as they are.
+    """
+
+    inputs_key: Optional[str] = None
+    population_key: Optional[str] = None
+    df: Optional[pd.DataFrame] = None
+    segments: Any = None
+    details: dict = field(default_factory=dict)
+    summary: Optional[str] = None
+    summary_error: Optional[str] = None
+    figures: dict = field(default_factory=dict)
+
+    @property
+    def has_result(self):
+        return self.df is not None and not self.df.empty
+
+    def is_current(self, inputs_key):
+        return self.has_result and self.inputs_key == inputs_key
+
+    def store_result(self, inputs_key, population_key, df, segments=None, **details):
+        self.inputs_key = inputs_key
+        self.population_key = population_key
+        self.df = df
+        self.segments = segments
+        self.details = details
+        self.summary = None
+        self.summary_error = None
+        self.figures = {}
+
+    def clear(self):
+        self.store_result(None, None, None)
+
+
+def get_demand_session():
+    """The current browser session's Demand Meter state, created on first access."""
+    if DEMAND_STATE_KEY not in st.session_state:
+        st.session_state[DEMAND_STATE_KEY] = DemandSession()
+    return st.session_state[DEMAND_STATE_KEY]
@@ -0,0 +1,226 @@
+import hashlib
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+import pandas as pd
+from modules import instrumentation, segments as segment_engine
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the scoring model changes so cached results are invalidated.
+ENGINE_VERSION = 1
+SCORE_MIN = 60
+SCORE_MAX = 90
+# Upper bound on (combinations x bots) cells materialised per chunk; ~32 MB of uint64 work space.
+CHUNK_CELLS = 4_000_000
+RESULT_COLUMNS = ["Feature", "Tagline", "Price", "Demand Score"]
+EXECUTORS = ("serial", "thread", "process")
+# Shards per worker, so a slow shard does not leave the other workers idle.
+SHARDS_PER_WORKER = 4
+# Minimum seconds between progress updates; each one is a message to the browser.
+PROGRESS_INTERVAL = 0.25
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+
+def resolve_seed(seed=None):
+    """Returns the seed to use for a sweep, drawing a fresh one if none was given."""
+    if seed is None:
+        return int(np.random.default_rng().integers(2**63))
+    return int(seed)
+
+
+def cell_keys(combinations, seed):
+    """Stable 64-bit stream key for every (feature, tagline, price) cell."""
+    keys = np.empty(len(combinations), dtype=np.uint64)
+    for i, (feature, tagline, price) in enumerate(combinations):
+        token = f"{seed}\x1f{feature}\x1f{tagline}\x1f{float(price)!r}".encode()
+        keys[i] = int.from_bytes(hashlib.blake2b(token, digest_size=8).digest(), "little")
+    return keys
+
+
+def _mix64(x):
+    # SplitMix64 finaliser; uint64 arithmetic wraps, which is what we want here.
+    x ^= x >> np.uint64(30)
+    x *= _MIX1
+    x ^= x >> np.uint64(27)
+    x *= _MIX2
+    x ^= x >> np.uint64(31)
+    return x
+
+
+def score_matrix(keys, num_bots):
+    """(cells x bots) matrix of integer scores in [SCORE_MIN, SCORE_MAX].
+
+    Each score is a hash of the cell key and the bot index, so a cell's scores
+    are the same whichever chunk, grid or worker it is computed in.
+    """
+    counters = np.arange(1, num_bots + 1, dtype=np.uint64) * _GOLDEN
+    x = _mix64(keys[:, None] + counters[None, :])
+    span = np.uint64(SCORE_MAX - SCORE_MIN + 1)
+    return (x % span).astype(np.uint8) + np.uint8(SCORE_MIN)
+
+
+def chunk_bounds(total, num_bots, chunk_size=None, num_workers=1):
+    """Splits ``total`` combinations into [start, stop) chunks of bounded size."""
+    if chunk_size is None:
+        chunk_size = max(1, CHUNK_CELLS // max(1, num_bots))
+        if num_workers > 1:
+            chunk_size = max(1, min(chunk_size, math.ceil(total / (num_workers * SHARDS_PER_WORKER))))
+    return [(start, min(start + chunk_size, total)) for start in range(0, total, chunk_size)]
+
+
+def demand_scores(keys, num_bots):
+    """Mean demand score of each cell."""
+    return score_matrix(keys, num_bots).mean(axis=1)
+
+
+def segment_demand_scores(keys, num_bots, segment_codes, num_segments):
+    """Mean demand score of each cell plus its per-segment score sums, from one score matrix."""
+    scores = score_matrix(keys, num_bots)
+    return scores.mean(axis=1), segment_engine.segment_sums(scores, segment_codes, num_segments)
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(backend, max_workers=None):
+    """Process-wide pool for ``backend``, reused across sweeps.
+
+    A process pool left broken by a dead worker (e.g. an OOM kill) is
+    replaced instead of being handed out again.
+    """
+    if backend not in ("thread", "process"):
+        raise ValueError(f"Unknown executor backend '{backend}'. Expected one of {EXECUTORS}.")
+    max_workers = max_workers or os.cpu_count() or 1
+    with _executors_lock:
+        pool = _executors.get((backend, max_workers))
+        if pool is not None and getattr(pool, "_broken", False):
+            logger.warning("Replacing broken %s pool with %d workers", backend, max_workers)
+            pool.shutdown(wait=False, cancel_futures=True)
+            pool = None
+        if pool is None:
+            if backend == "thread":
+                pool = ThreadPoolExecutor(max_workers=max_workers)
+            else:
+                # Forking a multi-threaded server can copy a held lock into the child and
+                # deadlock it, so workers start from a clean forkserver process instead.
+                pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("forkserver"))
+            _executors[(backend, max_workers)] = pool
+        return pool
+
+
+def discard_executor(pool):
+    """Drops ``pool`` from the shared pools so the next ``get_executor`` call builds a fresh one."""
+    with _executors_lock:
+        for key, cached in list(_executors.items()):
+            if cached is pool:
+                del _executors[key]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@instrumentation.timed("simulate_grid")
+def simulate_grid(combinations, population, seed, chunk_size=None, progress=None, executor="serial", max_workers=None, segments=None):
+    """Scores every combination against the whole population in vectorized chunks.
+
+    With ``executor`` set to "thread" or "process" the chunks are sharded across
+    a worker pool. Results are written back by position and progress is only
+    reported from the calling thread, at most every PROGRESS_INTERVAL seconds,
+    so output does not depend on worker count.
+
+    Given a ``segments`` index, per-segment score sums are accumulated in the
+    same pass and ``(df, SegmentedDemand)`` is returned instead of ``df``.
+    """
+    if executor not in EXECUTORS:
+        raise ValueError(f"Unknown executor backend '{executor}'. Expected one of {EXECUTORS}.")
+    combinations = list(combinations)
+    num_bots = len(population)
+    keys = cell_keys(combinations, seed)
+    scores = np.empty(len(combinations), dtype=np.float64)
+    sums = np.empty((len(combinations), len(segments)), dtype=np.float32) if segments is not None else None
+    num_workers = 1 if executor == "serial" else (max_workers or os.cpu_count() or 1)
+    bounds = chunk_bounds(len(combinations), num_bots, chunk_size, num_workers)
+
+    if segments is None:
+        kernel, extra = demand_scores, ()
+    else:
+        kernel, extra = segment_demand_scores, (segments.codes, len(segments))
+
+    last_report = [0.0]
+
+    def store(done, start, stop, result):
+        if sums is None:
+            scores[start:stop] = result
+        else:
+            scores[start:stop], sums[start:stop] = result
+        now = time.monotonic()
+        if progress is not None and (done == len(bounds) or now - last_report[0] >= PROGRESS_INTERVAL):
+            last_report[0] = now
+            progress.progress(done / len(bounds))
+
+    if executor == "serial":
+        for done, (start, stop) in enumerate(bounds, start=1):
+            store(done, start, stop, kernel(keys[start:stop], num_bots, *extra))
+    else:
+        pool = get_executor(executor, max_workers)
+        try:
+            futures = {pool.submit(kernel, keys[start:stop], num_bots, *extra): (start, stop) for start, stop in bounds}
+            for done, future in enumerate(as_completed(futures), start=1):
+                start, stop = futures[future]
+                store(done, start, stop, future.result())
+        except BrokenProcessPool:
+            discard_executor(pool)
+            raise
+    logger.debug("Simulated %d combinations in %d chunks (%s)", len(combinations), len(bounds), executor)
+    df = to_frame(combinations, scores)
+    if segments is None:
+        return df
+    return df, segment_engine.SegmentedDemand(df[RESULT_COLUMNS[:3]], sums, segments)
+
+
+def _cell_index(combinations):
+    return pd.MultiIndex.from_tuples([(f, t, float(p)) for f, t, p in combinations], names=RESULT_COLUMNS[:3])
+
+
+def missing_cells(previous, combinations):
+    """Combinations that have no row in a previously computed grid."""
+    if previous is None or previous.empty:
+        return list(combinations)
+    known = pd.MultiIndex.from_frame(previous[RESULT_COLUMNS[:3]])
+    present = _cell_index(combinations).isin(known)
+    return [combo for combo, found in zip(combinations, present, strict=True) if not found]
+
+
+def merge_grid(previous, fresh, combinations):
+    """Combines reused and freshly simulated rows into the grid for ``combinations``.
+
+    Rows for cells no longer in ``combinations`` are dropped and the result is
+    ordered as a full sweep over ``combinations`` would be.
+    """
+    frames = [frame for frame in (previous, fresh) if frame is not None and not frame.empty]
+    if not frames or not combinations:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    rows = pd.concat(frames, ignore_index=True).drop_duplicates(RESULT_COLUMNS[:3], keep="last")
+    rows = rows.set_index(RESULT_COLUMNS[:3]).reindex(_cell_index(combinations))
+    return rows.reset_index()[RESULT_COLUMNS]
+
+
+def to_frame(combinations, scores):
+    if not combinations:
+        return pd.DataFrame(columns=RESULT_COLUMNS)
+    features, taglines, prices = zip(*combinations, strict=True)
+    return pd.DataFrame({
+        "Feature": list(features),
+        "Tagline": list(taglines),
+        "Price": np.asarray(prices, dtype=np.float64),
+        "Demand Score": scores,
+    })
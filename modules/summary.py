@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import SimpleNamespace
+from modules import instrumentation
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_CACHE_DIR = os.path.join(os.getenv("OMNIVIA_CACHE_DIR", ".omnivia_cache"), "summaries")
+SUMMARY_MODEL = "gpt-3.5-turbo"
+SUMMARY_TIMEOUT = 20.0
+TOP_K = 5
+
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="omnivia-summary")
+
+
+def _rows(df):
+    return [
+        {"Feature": row.Feature, "Tagline": row.Tagline, "Price": float(row.Price), "Demand Score": round(float(row.Score), 2)}
+        for row in df.rename(columns={"Demand Score": "Score"}).itertuples(index=False)
+    ]
+
+
+def _marginal(df, column, top_k):
+    means = df.groupby(column, sort=False)["Demand Score"].mean().sort_values(ascending=False).round(2)
+    if len(means) > 2 * top_k:
+        means = means.iloc[list(range(top_k)) + list(range(len(means) - top_k, len(means)))]
+    return {str(key): float(value) for key, value in means.items()}
+
+
+def digest(df, top_k=TOP_K):
+    """Compact statistical digest of a result grid, bounded in size whatever the grid size."""
+    scores = df["Demand Score"]
+    ranked = df.sort_values("Demand Score", ascending=False)
+    return {
+        "combinations": int(len(df)),
+        "features": int(df["Feature"].nunique()),
+        "taglines": int(df["Tagline"].nunique()),
+        "prices": int(df["Price"].nunique()),
+        "demand": {
+            "mean": round(float(scores.mean()), 2),
+            "std": round(float(scores.std(ddof=0)), 2),
+            "min": round(float(scores.min()), 2),
+            "max": round(float(scores.max()), 2),
+        },
+        "top": _rows(ranked.head(top_k)),
+        "bottom": _rows(ranked.tail(top_k)),
+        "by_feature": _marginal(df, "Feature", top_k),
+        "by_tagline": _marginal(df, "Tagline", top_k),
+        "by_price": _marginal(df, "Price", top_k),
+    }
+
+
+def digest_hash(data, model=SUMMARY_MODEL):
+    payload = json.dumps({"model": model, "digest": data}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def build_prompt(data):
+    return (
+        "Generate an executive summary of a product demand simulation. "
+        "Demand scores are averages over simulated respondents. "
+        "Only the highest and lowest entries of each breakdown are listed.\n"
+        f"{json.dumps(data, indent=1)}"
+    )
+
+
+class SummaryCache:
+    """Completed summaries stored as one JSON file per digest hash."""
+
+    def __init__(self, directory=SUMMARY_CACHE_DIR):
+        self.directory = directory
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                return json.load(f)["summary"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+
+    def put(self, key, summary):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "created": time.time()}, f)
+        os.replace(tmp_path, path)
+
+
+class Summarizer:
+    """Generates executive summaries on a background thread, cached by digest hash.
+
+    ``client`` is anything exposing ``chat.completions.create`` like the OpenAI
+    client, e.g. ``StubChatClient`` for offline runs.
+    """
+
+    def __init__(self, client, model=SUMMARY_MODEL, cache=None, max_tokens=200, timeout=SUMMARY_TIMEOUT):
+        self.client = client
+        self.model = model
+        self.cache = cache if cache is not None else SummaryCache()
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self._inflight = {}
+        # Re-entrant: a done callback can run inline while submit holds the lock.
+        self._lock = threading.RLock()
+
+    def submit(self, df):
+        """Returns a Future resolving to the summary text for ``df``."""
+        data = digest(df)
+        key = digest_hash(data, self.model)
+        cached = self.cache.get(key)
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+        with self._lock:
+            # Reruns while a request is in flight attach to it instead of sending another.
+            future = self._inflight.get(key)
+            if future is None:
+                future = _pool.submit(self._complete, key, data)
+                self._inflight[key] = future
+                future.add_done_callback(lambda _: self._forget(key))
+            return future
+
+    def summarize(self, df):
+        """Blocking variant of ``submit`` bounded by the configured timeout."""
+        return self.submit(df).result(timeout=self.timeout)
+
+    def _forget(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def _complete(self, key, data):
+        with instrumentation.span("openai_summary"):
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": "You are a helpful assistant."},
+                    {"role": "user", "content": build_prompt(data)}
+                ],
+                max_tokens=self.max_tokens,
+                timeout=self.timeout,
+            )
+        if not response.choices:
+            return ""
+        summary = response.choices[0].message.content.strip()
+        if summary:
+            self.cache.put(key, summary)
+        return summary
+
+
+class StubChatClient:
+    """Offline stand-in for the OpenAI client, for tests and benchmarks."""
+
+    def __init__(self, reply="Stub executive summary.", latency=0.0):
+        self.reply = reply
+        self.latency = latency
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, **kwargs):
+        self.calls.append({"model": model, "messages": messages, **kwargs})
+        if self.latency:
+            time.sleep(self.latency)
+        message = SimpleNamespace(content=self.reply)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
@@ -1,7 +1,6 @@
-import random
-import pandas as pd
 import logging
-import autogen
+import streamlit as st
+from modules import db, events, instrumentation, population as population_engine, segments, simulation
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s:%(message)s')
@@ -13,57 +12,61 @@ file_handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s:%(message
 
 logger.addHandler(file_handler)
 
-def generate_survey_data(num_bots, male_percentage, income_range, interests_list):
+@instrumentation.timed("generate_survey_data")
+def generate_survey_data(num_bots, male_percentage, income_range, interests_list, seed=None):
     try:
-        data = [{'gender': 'male' if random.random() < male_percentage / 100 else 'female',
-                 'income': random.randint(income_range[0], income_range[1]) * 1000,
-                 'interests': random.sample(interests_list, k=min(len(interests_list), 3))}
-                for _ in range(num_bots)]
-        logger.info(f"Generated survey data: {data[:5]}...")  # Log a sample of generated data
+        data = population_engine.generate_population(num_bots, male_percentage, income_range, interests_list, seed=seed)
+        logger.debug("Generated survey data for %d bots", len(data))
         return data
     except Exception as e:
         logger.error(f"Error generating survey data: {str(e)}")
         raise
 
-def simulate_demand(feature, tagline, price, num_bots, male_percentage, income_range, interests_list, progress, total_combinations, current_index):
+@instrumentation.timed("simulate_demand")
+def simulate_demand(feature, tagline, price, num_bots, male_percentage, income_range, interests_list, progress, total_combinations, current_index, population=None, seed=None):
     try:
         logger.info(f"Starting simulation for feature: {feature}, tagline: {tagline}, price: {price}")
-        bot_data = generate_survey_data(num_bots, male_percentage, income_range, interests_list)
-        demand_score = sum(random.randint(60, 90) for _ in bot_data) / len(bot_data)
+        seed = simulation.resolve_seed(seed)
+        bot_data = population if population is not None else generate_survey_data(num_bots, male_percentage, income_range, interests_list, seed=seed)
+        keys = simulation.cell_keys([(feature, tagline, price)], seed)
+        demand_score = float(simulation.demand_scores(keys, len(bot_data))[0])
         response_data = {
             "Feature": feature,
             "Tagline": tagline,
             "Price": float(price),
             "Demand Score": demand_score
         }
-        autogen.runtime_logging.start(logger_type="file", config={"filename": "demand_simulation.log"})
-        autogen.runtime_logging.log_event(name="demand_simulation", event=response_data, source="demand_meter")
-        autogen.runtime_logging.stop()
+        events.log_event("demand_simulation", response_data, source="demand_meter")
         progress.progress((current_index + 1) / total_combinations)
         logger.info(f"Simulation successful for feature: {feature}, tagline: {tagline}, price: {price}")
         return response_data
     except Exception as e:
         error_data = {"Feature": feature, "Tagline": tagline, "Price": price, "Error": str(e)}
-        autogen.runtime_logging.start(logger_type="file", config={"filename": "demand_simulation_errors.log"})
-        autogen.runtime_logging.log_event(name="demand_simulation_error", event=error_data, source="demand_meter")
-        autogen.runtime_logging.stop()
+        events.log_event("demand_simulation_error", error_data, source="demand_meter")
         logger.error(f"Error in simulate_demand for feature: {feature}, tagline: {tagline}, price: {price} - {str(e)}")
         return None
 
-def process_simulation(combinations, num_bots, male_percentage, income_range, interests_list, progress):
-    results = []
-    total_combinations = len(combinations)
-    for current_index, (feature, tagline, price) in enumerate(combinations):
-        result = simulate_demand(feature, tagline, price, num_bots, male_percentage, income_range, interests_list, progress, total_combinations, current_index)
-        if result:
-            results.append(result)
-        progress.progress((current_index + 1) / total_combinations)
-    if not results:
-        autogen.runtime_logging.start(logger_type="file", config={"filename": "process_simulation_errors.log"})
-        autogen.runtime_logging.log_event(name="process_simulation_error", event={"Error": "No valid results returned"}, source="demand_meter")
-        autogen.runtime_logging.stop()
+def process_simulation(combinations, num_bots, male_percentage, income_range, interests_list, progress, seed=None, chunk_size=None, executor="serial", max_workers=None, with_segments=False):
+    """Simulates demand for every combination; with ``with_segments`` returns ``(df, SegmentedDemand)``."""
+    seed = simulation.resolve_seed(seed)
+    segmented = None
+    try:
+        # The population does not depend on the combination, so draw it once per sweep.
+        bot_data = generate_survey_data(num_bots, male_percentage, income_range, interests_list, seed=seed)
+        segment_index = segments.SegmentIndex(bot_data) if with_segments else None
+        result = simulation.simulate_grid(combinations, bot_data, seed, chunk_size=chunk_size, progress=progress, executor=executor, max_workers=max_workers, segments=segment_index)
+        df, segmented = result if with_segments else (result, None)
+    except Exception as e:
+        events.log_event("demand_simulation_error", {"Seed": seed, "Error": str(e)}, source="demand_meter")
+        logger.error(f"Error in process_simulation: {str(e)}")
+        raise
+    if df.empty:
+        events.log_event("process_simulation_error", {"Error": "No valid results returned"}, source="demand_meter")
         logger.warning("No valid results returned in process_simulation.")
-    return pd.DataFrame(results)
+        return (df, segmented) if with_segments else df
+    events.log_events("demand_simulation", df.to_dict(orient="records"), source="demand_meter")
+    logger.info("Simulated %d combinations with seed %d", len(df), seed)
+    return (df, segmented) if with_segments else df
 
 def update_progress(progress, value):
     blocks = int(value / 5)
@@ -77,6 +80,13 @@ def update_progress(progress, value):
         <div class="progress-text">{value}%</div>
     """, unsafe_allow_html=True)
 
+def auto_refresh(interval):
+    """Reruns the decorated function every ``interval`` seconds without rerunning the page."""
+    fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+    if fragment is None:
+        return lambda fn: fn
+    return fragment(run_every=interval)
+
 def generate_insights(assistant, user_proxy, df_dict):
     insights_prompt = f"Analyze the demand scores for the following combinations and provide insights:\n{df_dict}"
     user_proxy.initiate_chat(assistant, message=insights_prompt)
@@ -84,13 +94,11 @@ def generate_insights(assistant, user_proxy, df_dict):
 
 def log_feedback(product_name, feedback):
     feedback_data = {"Product Name": product_name, "Feedback": feedback}
-    autogen.runtime_logging.start(logger_type="file", config={"filename": "user_feedback.log"})
-    autogen.runtime_logging.log_event(name="user_feedback", event=feedback_data, source="demand_meter")
-    autogen.runtime_logging.stop()
+    events.log_event("user_feedback", feedback_data, source="demand_meter")
+    if db.is_configured():
+        db.get_write_buffer(db.FEEDBACK_COLLECTION).add(dict(feedback_data))
 
 def log_error(section, error_message):
     error_data = {"Section": section, "Error": error_message}
-    autogen.runtime_logging.start(logger_type="file", config={"filename": "app_errors.log"})
-    autogen.runtime_logging.log_event(name="app_error", event=error_data, source="omnivia_survey_platform")
-    autogen.runtime_logging.stop()
+    events.log_event("app_error", error_data, source="omnivia_survey_platform")
     logger.error(f"Error in {section}: {error_message}")
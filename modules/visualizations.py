@@ -1,19 +1,105 @@
+import io
+import numpy as np
 import streamlit as st
-import seaborn as sns
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from modules import charts, instrumentation
+
+HISTOGRAM_BINS = 20
+# The KDE is evaluated from a fine histogram of the scores, so its cost does not grow with rows.
+KDE_BINS = 512
+KDE_GRID_POINTS = 200
+# Cell values are written on the heatmap only while they stay legible.
+ANNOTATE_LIMIT = 150
+MAX_CACHED_ARTIFACTS = 32
+DPI = 100
+
+_artifacts = charts.FigureCache(max_entries=MAX_CACHED_ARTIFACTS)
+
+
+def scott_bandwidth(values):
+    """Scott's rule, the default bandwidth of seaborn's KDE."""
+    return values.std(ddof=1) * len(values) ** (-1 / 5)
+
+
+def distribution_data(scores, bins=HISTOGRAM_BINS):
+    """Histogram counts and a Gaussian KDE scaled to the same count axis."""
+    scores = np.asarray(scores, dtype=np.float64)
+    scores = scores[np.isfinite(scores)]
+    counts, edges = np.histogram(scores, bins=bins)
+    data = {"counts": counts, "edges": edges, "kde_x": None, "kde_y": None}
+    bandwidth = scott_bandwidth(scores) if len(scores) > 1 else 0.0
+    if bandwidth > 0:
+        fine_counts, fine_edges = np.histogram(scores, bins=KDE_BINS)
+        centers = (fine_edges[:-1] + fine_edges[1:]) / 2
+        grid = np.linspace(scores.min(), scores.max(), KDE_GRID_POINTS)
+        z = (grid[:, None] - centers[None, :]) / bandwidth
+        density = (np.exp(-0.5 * z * z) @ fine_counts) / (len(scores) * bandwidth * np.sqrt(2 * np.pi))
+        data["kde_x"], data["kde_y"] = grid, density * len(scores) * (edges[1] - edges[0])
+    return data
+
+
+@instrumentation.timed("pivot")
+def heatmap_data(df):
+    return df.pivot_table(values='Demand Score', index='Feature', columns='Tagline', aggfunc='mean')
+
+
+def _png(fig):
+    # Figures are built without pyplot, so nothing keeps them alive once the PNG is written.
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=DPI, bbox_inches="tight")
+    fig.clear()
+    return buffer.getvalue()
+
+
+@instrumentation.timed("render_distribution")
+def render_distribution(df):
+    """PNG bytes of the demand score histogram with its KDE overlay."""
+    data = distribution_data(df['Demand Score'].to_numpy())
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    ax.stairs(data["counts"], data["edges"], fill=True, alpha=0.5, edgecolor="C0")
+    if data["kde_x"] is not None:
+        ax.plot(data["kde_x"], data["kde_y"], color="C0")
+    ax.set_xlabel("Demand Score")
+    ax.set_ylabel("Count")
+    return _png(fig)
+
+
+@instrumentation.timed("render_heatmap")
+def render_heatmap(df):
+    """PNG bytes of the mean demand per feature and tagline."""
+    pivot = heatmap_data(df)
+    values = pivot.to_numpy()
+    fig = Figure(figsize=(12, 8))
+    ax = fig.subplots()
+    image = ax.imshow(values, cmap="YlGnBu", aspect="auto", interpolation="nearest")
+    fig.colorbar(image, ax=ax)
+    ax.set_xticks(np.arange(values.shape[1]), labels=pivot.columns, rotation=90)
+    ax.set_yticks(np.arange(values.shape[0]), labels=pivot.index)
+    ax.set_xlabel("Tagline")
+    ax.set_ylabel("Feature")
+    if values.size <= ANNOTATE_LIMIT:
+        threshold = np.nanmean(values)
+        for (row, col), value in np.ndenumerate(values):
+            if np.isfinite(value):
+                ax.text(col, row, f"{value:.1f}", ha="center", va="center", color="white" if value > threshold else "black")
+    return _png(fig)
+
+
+def cached_render(kind, df):
+    """Rendered PNG for ``df``, built once per distinct result and kept in a bounded LRU."""
+    render = {"distribution": render_distribution, "heatmap": render_heatmap}[kind]
+    return _artifacts.get_or_build((kind, charts.result_hash(df)), lambda: render(df))
+
 
 def plot_demand_distribution(df):
     st.write("### Demand Score Distribution")
-    fig, ax = plt.subplots(figsize=(10, 6))
-    sns.histplot(df['Demand Score'], bins=20, kde=True, ax=ax)
-    st.pyplot(fig)
+    st.image(cached_render("distribution", df))
+
 
 def plot_demand_heatmap(df):
     st.write("### Demand Score Heatmap")
     try:
-        heatmap_data = df.pivot_table(values='Demand Score', index='Feature', columns='Tagline', aggfunc='mean')
-        fig, ax = plt.subplots(figsize=(12, 8))
-        sns.heatmap(heatmap_data, annot=True, cmap="YlGnBu", ax=ax)
-        st.pyplot(fig)
+        st.image(cached_render("heatmap", df))
     except Exception as e:
         st.error(f"Error creating heatmap: {str(e)}")
@@ -0,0 +1,103 @@
+import hashlib
+import itertools
+import threading
+import time
+from collections import Counter
+
+NUM_SHARDS = 16
+POLL_DURATION = 60
+# Closed polls stay readable this long, then they and their counts are dropped.
+POLL_RETENTION = 600
+
+
+class VoteAggregator:
+    """Process-wide live-poll vote counts shared by every Streamlit session.
+
+    Counts are sharded: each thread is pinned to one shard, so concurrent
+    sessions voting at the same time rarely wait on the same lock. Snapshots
+    sum the shards.
+    """
+
+    def __init__(self, num_shards=NUM_SHARDS, retention=POLL_RETENTION):
+        self._shards = [(threading.Lock(), {}) for _ in range(num_shards)]
+        self._next_shard = itertools.count()
+        self._local = threading.local()
+        self._polls = {}
+        self._generations = {}
+        self._polls_lock = threading.Lock()
+        self.retention = retention
+
+    def _shard(self):
+        index = getattr(self._local, "shard", None)
+        if index is None:
+            index = self._local.shard = next(self._next_shard) % len(self._shards)
+        return self._shards[index]
+
+    def open_poll(self, question, options, duration=POLL_DURATION):
+        """Registers a poll and returns its id.
+
+        Reopening a poll that is still open keeps its votes; once it has closed,
+        reopening starts a new generation with a new id and empty counts.
+        """
+        options = [option for option in options if option]
+        base_id = hashlib.sha1("\x1f".join([question, *options]).encode()).hexdigest()[:12]
+        with self._polls_lock:
+            self._prune()
+            generation = self._generations.get(base_id, 0)
+            poll_id = f"{base_id}-{generation}"
+            if not self.is_open(poll_id):
+                generation += 1
+                poll_id = f"{base_id}-{generation}"
+                self._generations[base_id] = generation
+                self._polls[poll_id] = {"id": poll_id, "question": question, "options": options, "closes_at": time.time() + duration}
+        return poll_id
+
+    def _prune(self):
+        """Drops polls closed for longer than ``retention`` and their shard counts; holds ``_polls_lock``."""
+        cutoff = time.time() - self.retention
+        expired = [poll_id for poll_id, poll in self._polls.items() if poll["closes_at"] < cutoff]
+        if not expired:
+            return
+        for poll_id in expired:
+            del self._polls[poll_id]
+        for lock, counts in self._shards:
+            with lock:
+                for poll_id in expired:
+                    counts.pop(poll_id, None)
+
+    def poll(self, poll_id):
+        with self._polls_lock:
+            return dict(self._polls[poll_id])
+
+    def open_polls(self):
+        now = time.time()
+        with self._polls_lock:
+            self._prune()
+            return [dict(poll) for poll in self._polls.values() if poll["closes_at"] > now]
+
+    def is_open(self, poll_id):
+        poll = self._polls.get(poll_id)
+        return poll is not None and poll["closes_at"] > time.time()
+
+    def vote(self, poll_id, option, count=1):
+        if not self.is_open(poll_id):
+            raise ValueError("This poll is closed.")
+        lock, counts = self._shard()
+        with lock:
+            poll_counts = counts.get(poll_id)
+            if poll_counts is None:
+                poll_counts = counts[poll_id] = Counter()
+            poll_counts[option] += count
+
+    def snapshot(self, poll_id):
+        """Current totals for every option of a poll."""
+        totals = Counter()
+        for lock, counts in self._shards:
+            with lock:
+                poll_counts = counts.get(poll_id)
+                if poll_counts:
+                    totals.update(poll_counts)
+        with self._polls_lock:
+            poll = self._polls.get(poll_id)
+            options = list(poll["options"]) if poll is not None else list(totals)
+        return {option: totals.get(option, 0) for option in options}